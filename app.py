@@ -2,18 +2,39 @@
 # This is a sample Streamlit app to demonstrate the basic structure.
 # You will need to adapt this code to fit your specific FarmFinanceOptimizer logic.
 
+import json
+import threading
+from contextlib import nullcontext
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 
+import instrumentation
+from batch_service import BatchService, ResultCache
+from optimizer import AllocationModel
+
 # --- App Title and Introduction ---
 st.set_page_config(page_title="Farm Finance Optimizer", layout="wide")
 st.title("🌾 Farm Finance Optimizer")
 st.markdown("""
 Welcome to the Farm Finance Optimizer! This tool helps you analyze different crop scenarios to
-maximize your profitability. Use the sidebar on the left to input your data and see the results.
+maximize your profitability. Enter your farm details and choose crops in the sidebar on the left,
+then set each crop's revenue, cost and acreage limits under Crop Details below.
 """)
 
+# Hidden diagnostics: opening the app with ?diagnostics=1 records timings for this
+# session only and shows them in a panel at the bottom of the page. Runs without
+# the parameter record nothing.
+show_diagnostics = st.query_params.get("diagnostics") == "1"
+instrumentation.use(
+    st.session_state.setdefault("diagnostics_recorder", instrumentation.Recorder()) if show_diagnostics else None
+)
+profile_run = show_diagnostics and st.session_state.get("diagnostics_profile", False)
+if profile_run:
+    # One-shot: the checkbox is cleared once this run has been profiled.
+    st.session_state["diagnostics_profile"] = False
+
 # --- Sidebar Inputs ---
 st.sidebar.header("Input Financial Data")
 # Use a number input for financial values
@@ -38,6 +59,15 @@ is_organic = st.sidebar.checkbox(
     help="Check this if you plan to allocate some land for organic crops."
 )
 
+# Working capital limits the total cost of the planted acres (0 means unlimited)
+working_capital = st.sidebar.number_input(
+    "Working capital available ($)",
+    min_value=0.0,
+    value=0.0,
+    step=1000.0,
+    help="Enter the operating money available for the season. Leave at 0 for no limit."
+)
+
 # Use a multi-select for choosing crops
 crop_options = ["Corn", "Soybeans", "Wheat", "Barley"]
 selected_crops = st.sidebar.multiselect(
@@ -47,76 +77,220 @@ selected_crops = st.sidebar.multiselect(
     help="Choose the crops you want to include in the optimization."
 )
 
-st.sidebar.markdown("---")
-st.sidebar.subheader("Crop Details")
-
-# Create a dictionary to hold the input data for each selected crop
-crop_data = {}
-for crop in selected_crops:
-    st.sidebar.markdown(f"**{crop}**")
-    revenue_per_acre = st.sidebar.number_input(
-        f"Revenue per acre for {crop} ($)",
-        min_value=0.0,
-        value=500.0,
-        step=50.0
-    )
-    cost_per_acre = st.sidebar.number_input(
-        f"Cost per acre for {crop} ($)",
-        min_value=0.0,
-        value=300.0,
-        step=20.0
-    )
-    crop_data[crop] = {
+# --- Cached compute stages ---
+# Streamlit reruns the script on every widget change. Each stage below is cached
+# on normalized (rounded) inputs, so a rerun only recomputes what actually changed.
+
+def normalize_money(value):
+    """Round to cents so equivalent inputs share a cache entry."""
+    return round(float(value), 2)
+
+@st.cache_data(show_spinner=False)
+def compute_crop_row(crop, revenue_per_acre, cost_per_acre, min_acres, max_acres, max_share):
+    """Derived figures for one crop; editing a crop only misses this crop's entry."""
+    return {
         'Revenue per Acre': revenue_per_acre,
         'Cost per Acre': cost_per_acre,
+        'Profit per Acre': revenue_per_acre - cost_per_acre,
+        'Min Acres': min_acres,
+        'Max Acres': max_acres,
+        'Max Share': max_share,
     }
 
-# --- Main Content: Display Results ---
-st.header("Financial Analysis Results")
+@st.cache_resource(show_spinner=False)
+def get_allocation_model(crops):
+    """One LP model per crop list, updated in place between solves (warm start)."""
+    n_crops = len(crops)
+    model = AllocationModel(list(crops), [1.0], np.zeros(n_crops), np.zeros(n_crops))
+    return model, threading.Lock()
+
+@st.cache_data(show_spinner=False)
+def solve_allocation(crop_rows, total_land, working_capital):
+    """Solve the allocation for normalized inputs.
+
+    crop_rows is a tuple of (crop, profit, cost, min acres, max acres, max share).
+    """
+    model, lock = get_allocation_model(tuple(row[0] for row in crop_rows))
+    with lock:
+        model.set_field_acres([total_land])
+        model.set_working_capital(working_capital)
+        for crop, profit, cost, min_acres, max_acres, max_share in crop_rows:
+            j = model.crops.index(crop)
+            if model.profit[0, j] != profit:
+                model.set_profit(crop, profit)
+            if model.cost[0, j] != cost:
+                model.set_cost(crop, cost)
+            if (model.min_acres[j], model.max_acres[j]) != (min_acres, max_acres):
+                model.set_crop_limits(crop, min_acres=min_acres, max_acres=max_acres)
+            if model.max_share[j] != max_share:
+                model.set_max_share(crop, max_share)
+        result = model.solve()
+    return {
+        'status': result['status'],
+        'total_profit': result['total_profit'],
+        'crop_acres': result['crop_acres'],
+    }
+
+# --- Crop details and results ---
+# The fragment reruns on its own when a crop input changes: the page header and
+# sidebar are not re-executed, and unchanged crops are served from the cache.
+@st.fragment
+def crop_analysis(selected_crops, total_land, working_capital):
+    st.subheader("Crop Details")
+    crop_data = {}
+    for column, crop in zip(st.columns(len(selected_crops)), selected_crops):
+        with column:
+            st.markdown(f"**{crop}**")
+            revenue_per_acre = st.number_input(
+                f"Revenue per acre for {crop} ($)",
+                min_value=0.0,
+                value=500.0,
+                step=50.0
+            )
+            cost_per_acre = st.number_input(
+                f"Cost per acre for {crop} ($)",
+                min_value=0.0,
+                value=300.0,
+                step=20.0
+            )
+            min_acres, max_acres = st.slider(
+                f"Acreage range for {crop}",
+                min_value=0.0,
+                max_value=float(total_land),
+                value=(0.0, float(total_land)),
+                help="Minimum and maximum acres to plant with this crop."
+            )
+            max_share = st.slider(
+                f"Maximum share of planted acres for {crop} (%)",
+                min_value=0,
+                max_value=100,
+                value=100,
+                help="Rotation limit, e.g. 50% keeps corn on at most half of the planted acres."
+            )
+        crop_data[crop] = compute_crop_row(
+            crop,
+            normalize_money(revenue_per_acre),
+            normalize_money(cost_per_acre),
+            normalize_money(min_acres),
+            normalize_money(max_acres),
+            max_share / 100.0,
+        )
 
-if not selected_crops:
-    st.warning("Please select at least one crop to perform the analysis.")
-else:
     # Convert crop data to a DataFrame for easier handling and display
     df_crop_data = pd.DataFrame.from_dict(crop_data, orient='index')
 
-    # Calculate Profit per Acre and add it to the DataFrame
-    df_crop_data['Profit per Acre'] = df_crop_data['Revenue per Acre'] - df_crop_data['Cost per Acre']
-
     # Display the input data in a table
     st.subheader("Input Data Summary")
     st.dataframe(df_crop_data)
 
-    # Simple optimization logic:
-    # Assuming the app optimizes by allocating all land to the most profitable crop.
-    if not df_crop_data.empty:
-        most_profitable_crop = df_crop_data['Profit per Acre'].idxmax()
-        profit_per_acre = df_crop_data.loc[most_profitable_crop, 'Profit per Acre']
-        max_profit = total_land * profit_per_acre
+    # Multi-crop optimization: allocate the land across the selected crops with a
+    # linear programme, memoized on the normalized inputs.
+    crop_rows = tuple(
+        (crop, row['Profit per Acre'], row['Cost per Acre'], row['Min Acres'], row['Max Acres'], row['Max Share'])
+        for crop, row in crop_data.items()
+    )
+    capital_limit = normalize_money(working_capital) if working_capital > 0 else None
+    with instrumentation.span('app.solve_allocation'):
+        result = solve_allocation(crop_rows, normalize_money(total_land), capital_limit)
 
-        st.subheader("Optimization Recommendation")
-        st.info(
-            f"Based on your inputs, the most profitable single crop is **{most_profitable_crop}** "
-            f"with a profit of **${profit_per_acre:.2f} per acre**."
+    st.subheader("Optimization Recommendation")
+    if result['status'] != 'Optimal':
+        st.error(
+            f"No feasible allocation was found (solver status: {result['status']}). "
+            "Check that the minimum acres fit within your land and working capital."
         )
-
-        st.success(
-            f"If you allocate all **{total_land:.0f} acres** to **{most_profitable_crop}**, "
-            f"your potential total profit is **${max_profit:.2f}**."
+    else:
+        allocation = pd.DataFrame({
+            'Acres': result['crop_acres'],
+            'Profit': result['crop_acres'] * df_crop_data['Profit per Acre'],
+        })
+        planted = allocation['Acres'].sum()
+        st.info(
+            f"Plant **{planted:.0f} of {total_land:.0f} acres** across "
+            f"**{(allocation['Acres'] > 0).sum()}** crop(s) for a total profit of "
+            f"**${result['total_profit']:,.2f}**."
         )
-
-        st.balloons()
+        st.dataframe(allocation[allocation['Acres'] > 0])
 
     # --- Data Visualization ---
     st.header("Visualizing Profitability")
-    if not df_crop_data.empty:
-        # Sort the data for a better-looking chart
-        df_sorted = df_crop_data.sort_values('Profit per Acre', ascending=False)
-        st.bar_chart(df_sorted[['Profit per Acre']])
+    # Sort the data for a better-looking chart
+    df_sorted = df_crop_data.sort_values('Profit per Acre', ascending=False)
+    st.bar_chart(df_sorted[['Profit per Acre']])
+
+# --- Main Content: Display Results ---
+st.header("Financial Analysis Results")
+
+if not selected_crops:
+    st.warning("Please select at least one crop to perform the analysis.")
+else:
+    with instrumentation.profile('app run') if profile_run else nullcontext():
+        with instrumentation.span('app.crop_analysis'):
+            crop_analysis(selected_crops, total_land, working_capital)
 
     # --- Additional Info based on a condition ---
     if is_organic:
         st.markdown("---")
         st.subheader("Organic Farming Considerations")
         st.write("You selected that a portion of your farm is organic. This version of the app doesn't yet factor in the specific higher revenues or costs of organic crops, but you can enter those values manually above to see the difference.")
-        st.write("Consider adding more complex optimization logic in the future to handle multiple crop allocations.")
+
+# --- Batch optimization ---
+# Solves uploaded jobs (one JSON object per line, see batch_service.py) for many
+# growers on a process pool; identical jobs are served from the result cache.
+def batch_optimization():
+    st.markdown("---")
+    with st.expander("Batch optimization (many growers)"):
+        uploaded = st.file_uploader("Jobs file (JSON lines)", type=["jsonl", "json"])
+        workers = st.number_input("Worker processes", min_value=1, value=4, step=1)
+        if uploaded is None or not st.button("Run batch"):
+            return
+        jobs = [json.loads(line) for line in uploaded.getvalue().decode("utf-8").splitlines() if line.strip()]
+        service = BatchService(max_workers=int(workers), cache=ResultCache())
+        progress = st.progress(0.0, text="Starting...")
+        events = []
+        for event in service.stream(jobs):
+            events.append(event)
+            progress.progress(event['done'] / event['total'], text=f"{event['done']} of {event['total']} jobs")
+        summary = pd.DataFrame([{
+            'Job': event['job_id'],
+            'Grower': event['grower'],
+            'Status': event['status'],
+            'Solver Status': event['result']['status'] if event['result'] else None,
+            'Total Profit': event['result']['total_profit'] if event['result'] else None,
+            'Seconds': event['seconds'],
+        } for event in events])
+        st.dataframe(summary)
+        st.download_button("Download results", "\n".join(json.dumps(event) for event in events),
+                           file_name="results.jsonl", mime="application/json")
+
+batch_optimization()
+
+# --- Diagnostics panel ---
+def diagnostics_panel():
+    st.markdown("---")
+    with st.expander("Diagnostics", expanded=True):
+        snapshot = instrumentation.snapshot()
+        spans = pd.DataFrame.from_dict(snapshot['spans'], orient='index')
+        if spans.empty:
+            st.caption("No timings recorded yet.")
+        else:
+            st.dataframe(spans.sort_values('total', ascending=False))
+        if snapshot['counters']:
+            st.dataframe(pd.Series(snapshot['counters'], name='Value'))
+
+        st.checkbox("Profile the next run (cProfile)", key="diagnostics_profile")
+        for captured in reversed(instrumentation.profiles()):
+            st.markdown(f"**{captured['label']}**: {captured['seconds']:.3f} s at {captured['recorded']}")
+            st.code(captured['stats'])
+
+        json_column, prometheus_column, reset_column = st.columns(3)
+        json_column.download_button("Download JSON", instrumentation.to_json(),
+                                    file_name="diagnostics.json", mime="application/json")
+        prometheus_column.download_button("Download Prometheus", instrumentation.to_prometheus(),
+                                          file_name="diagnostics.prom", mime="text/plain")
+        if reset_column.button("Reset"):
+            instrumentation.reset()
+            st.rerun()
+
+if show_diagnostics:
+    diagnostics_panel()
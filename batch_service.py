@@ -0,0 +1,337 @@
+"""Batch crop-allocation service for many growers.
+
+Takes optimization jobs (a grower's fields plus constraints), solves them on a
+process pool with per-job time limits, reuses results of identical jobs from
+an on-disk cache and streams progress as each job finishes.
+
+Usage:
+    python batch_service.py jobs.jsonl --output results.jsonl --workers 8 --time-limit 60
+
+Each line of the jobs file is a JSON object with the AllocationModel inputs:
+'crops', 'field_acres', 'profit_per_acre', 'cost_per_acre' and optionally
+'job_id', 'grower', 'working_capital', 'min_acres', 'max_acres', 'max_share',
+'allowed', 'field_ids' and 'time_limit'.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from optimizer import AllocationModel
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'FFO_RESULT_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'results')
+)
+DEFAULT_TIME_LIMIT = 60
+# Extra seconds past a job's solver time limit before it is reported as timed out.
+TIMEOUT_GRACE = 30
+
+# Job keys that define the problem; anything else (job_id, grower) is a label.
+MODEL_KEYS = ('crops', 'field_acres', 'profit_per_acre', 'cost_per_acre', 'working_capital',
+              'min_acres', 'max_acres', 'max_share', 'allowed', 'field_ids')
+
+
+def _plain(value):
+    """Convert NumPy values to JSON-compatible Python values."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def job_key(job):
+    """SHA-256 of the problem a job defines (its MODEL_KEYS and time limit)."""
+    problem = {key: _plain(job.get(key)) for key in MODEL_KEYS}
+    problem['time_limit'] = job.get('time_limit')
+    text = json.dumps(problem, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _upper_bounds(values):
+    """Per-crop upper bounds where None (JSON null) means unbounded."""
+    if values is None:
+        return None
+    return [np.inf if v is None else v for v in np.atleast_1d(np.asarray(values, dtype=object))]
+
+
+def solve_job(job):
+    """Solve one job in a worker process and return a JSON-compatible result."""
+    start = time.perf_counter()
+    model = AllocationModel(
+        job['crops'],
+        job['field_acres'],
+        job['profit_per_acre'],
+        job['cost_per_acre'],
+        working_capital=job.get('working_capital'),
+        min_acres=job.get('min_acres'),
+        max_acres=_upper_bounds(job.get('max_acres')),
+        max_share=job.get('max_share'),
+        allowed=job.get('allowed'),
+        field_ids=job.get('field_ids'),
+    )
+    result = model.solve(time_limit=job.get('time_limit'))
+    allocation = result['allocation']
+    return {
+        'status': result['status'],
+        'total_profit': result['total_profit'],
+        'crop_acres': _plain(result['crop_acres'].to_dict()),
+        'allocation': _plain(allocation.to_dict(orient='records')),
+        'solve_seconds': time.perf_counter() - start,
+    }
+
+
+class ResultCache:
+    """Solved job results stored as one JSON file per job_key."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            pass
+
+
+class BatchService:
+    """Solve many allocation jobs on a process pool.
+
+    Identical jobs (same job_key) are solved once per batch and, with a cache,
+    once across batches; only 'Optimal' results are cached. Each job runs CBC
+    with its time limit; a job whose worker has not answered TIMEOUT_GRACE
+    seconds after that is reported as timed out, and the pool is replaced
+    so the stuck worker does not keep holding a process.
+
+    Parameters:
+    - max_workers: Worker processes (default: all cores).
+    - cache: ResultCache, or None to disable caching across batches.
+    - time_limit: Default solver time limit per job in seconds.
+    """
+
+    def __init__(self, max_workers=None, cache=None, time_limit=DEFAULT_TIME_LIMIT):
+        self.max_workers = max_workers or os.cpu_count()
+        self.cache = cache
+        self.time_limit = time_limit
+
+    def run(self, jobs):
+        """Solve all jobs and return their events in completion order."""
+        return list(self.stream(jobs))
+
+    def stream(self, jobs):
+        """Solve jobs, yielding one event dict per job as it completes.
+
+        Events have 'job_id', 'grower', 'key', 'status' ('solved', 'cached',
+        'duplicate', 'failed' or 'timeout'), 'result' (see solve_job, None on
+        failure), 'error', 'seconds', 'done' and 'total'.
+        """
+        jobs = list(jobs)
+        total = len(jobs)
+        done = 0
+        waiting = {}  # key -> jobs with that key still waiting for a result
+        queue = []
+        for n, job in enumerate(jobs):
+            job = dict(job)
+            job.setdefault('job_id', str(n))
+            job.setdefault('time_limit', self.time_limit)
+            key = job_key(job)
+            if key in waiting:
+                waiting[key].append(job)
+                continue
+            waiting[key] = [job]
+            queue.append((key, job))
+
+        def finish(key, status, result=None, error=None, seconds=0.0):
+            nonlocal done
+            events = []
+            for position, job in enumerate(waiting.pop(key)):
+                done += 1
+                events.append({
+                    'job_id': job['job_id'],
+                    'grower': job.get('grower'),
+                    'key': key,
+                    'status': status if position == 0 or status not in ('solved', 'cached') else 'duplicate',
+                    'result': result,
+                    'error': error,
+                    'seconds': seconds,
+                    'done': done,
+                    'total': total,
+                })
+            return events
+
+        to_solve = []
+        for key, job in queue:
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                yield from finish(key, 'cached', result=cached)
+            else:
+                to_solve.append((key, job))
+        if not to_solve:
+            return
+
+        # At most one job per worker is submitted, so a job starts running as
+        # soon as it is submitted and its deadline is measured from then.
+        queue = deque(to_solve)
+        pending = {}  # future -> (key, job, started, deadline)
+        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or queue:
+                while queue and len(pending) < self.max_workers:
+                    key, job = queue.popleft()
+                    limit = job['time_limit']
+                    started = time.monotonic()
+                    deadline = started + limit + TIMEOUT_GRACE if limit else float('inf')
+                    pending[executor.submit(solve_job, job)] = (key, job, started, deadline)
+                next_deadline = min(entry[3] for entry in pending.values())
+                timeout = max(0.0, next_deadline - time.monotonic()) if next_deadline != float('inf') else None
+                finished, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key, job, started, _ = pending.pop(future)
+                    seconds = time.monotonic() - started
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        yield from finish(key, 'failed', error=f"{type(e).__name__}: {e}", seconds=seconds)
+                        continue
+                    if self.cache is not None and result['status'] == 'Optimal':
+                        self.cache.put(key, result)
+                    yield from finish(key, 'solved', result=result, seconds=seconds)
+
+                now = time.monotonic()
+                expired = [future for future, entry in pending.items() if now >= entry[3] and not future.done()]
+                if not expired:
+                    continue
+                for future in expired:
+                    key, job, started, _ = pending.pop(future)
+                    yield from finish(key, 'timeout', error="Job exceeded its time limit", seconds=now - started)
+                # A stuck worker cannot be interrupted: replace the whole pool and
+                # resubmit the jobs that were still running on the other workers.
+                _terminate(executor)
+                queue.extendleft(reversed([(entry[0], entry[1]) for entry in pending.values()]))
+                pending = {}
+                executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        finally:
+            if pending:
+                _terminate(executor)
+            else:
+                executor.shutdown()
+
+
+def _terminate(executor):
+    """Kill the worker processes of a pool, including ones stuck in a job."""
+    # ProcessPoolExecutor has no public API to stop a running task.
+    for process in list((getattr(executor, '_processes', None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def jobs_from_portfolio(store, budgets, year=None, **constraints):
+    """One job per grower from a portfolio_store.PortfolioStore.
+
+    Every field of the grower (in the given year, default all rows) may be
+    planted with any budgeted crop; profit and cost per acre come from the
+    crop budgets.
+
+    Parameters:
+    - store: PortfolioStore.
+    - budgets: Dict of crop name -> result of data_loader.load_data.
+    - year: Only use this year's field rows.
+    - constraints: Extra job keys (working_capital, max_share, time_limit, ...).
+    """
+    crops = [crop for crop, budget in budgets.items() if budget is not None]
+    costs = np.array([budgets[c]['cost_data']['Cost_Value'].sum() for c in crops])
+    profits = np.array([
+        budgets[c]['yield_value'] * budgets[c]['price_value']
+        + np.nan_to_num(budgets[c].get('straw_revenue', 0.0)) for c in crops
+    ]) - costs
+    for grower in store.growers:
+        rows = store.rows(grower=grower, year=year)
+        field_ids = store['field_id'][rows]
+        if len(field_ids) == 0:
+            continue
+        yield {
+            'job_id': f'{grower}' if year is None else f'{grower}-{year}',
+            'grower': grower,
+            'crops': crops,
+            'field_acres': _plain(np.asarray(store['acres'][rows])),
+            'field_ids': _plain(np.asarray(field_ids)),
+            'profit_per_acre': _plain(profits),
+            'cost_per_acre': _plain(costs),
+            **constraints,
+        }
+
+
+def read_jobs(path):
+    """Jobs from a JSON lines file."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve many crop-allocation jobs in parallel.")
+    parser.add_argument('jobs', help="JSON lines file of jobs")
+    parser.add_argument('--output', default='results.jsonl', help="JSON lines file of results")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT,
+                        help="Solver time limit per job in seconds")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Result cache directory")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write cached results")
+    parser.add_argument('--quiet', action='store_true', help="Do not print per-job progress")
+    args = parser.parse_args(argv)
+
+    service = BatchService(
+        max_workers=args.workers,
+        cache=None if args.no_cache else ResultCache(args.cache_dir),
+        time_limit=args.time_limit,
+    )
+    start = time.perf_counter()
+    counts = {}
+    with open(args.output, 'w') as output:
+        for event in service.stream(read_jobs(args.jobs)):
+            output.write(json.dumps(event) + '\n')
+            output.flush()
+            counts[event['status']] = counts.get(event['status'], 0) + 1
+            if not args.quiet:
+                detail = event['error'] or f"{event['result']['status']} ${event['result']['total_profit']:,.2f}"
+                print(f"[{event['done']}/{event['total']}] {event['status']:>9}  {event['seconds']:6.2f}s  "
+                      f"{event['job_id']}  ({detail})")
+    elapsed = time.perf_counter() - start
+    summary = ', '.join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"Finished {sum(counts.values())} jobs in {elapsed:.1f}s ({summary}) -> {args.output}")
+    return 1 if counts.get('failed') or counts.get('timeout') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,518 @@
+"""Headless benchmark suite for the loaders, profit math and report generation.
+
+Generates synthetic budget sheets, times each stage, records throughput and
+peak memory, and compares the run against a JSON baseline.
+
+Usage:
+    python benchmark.py --scale small --update-baseline   # record a baseline
+    python benchmark.py --scale small                     # fail on regressions
+    python benchmark.py --only parse_many_csv --files 100000
+
+The exit status is 1 when any benchmark fails, is slower (lower throughput) or
+uses more peak memory than the baseline by more than --tolerance, or when a
+start-up module exceeds its import-time budget or eagerly imports one of the
+optional report/Sheets dependencies (see IMPORT_BUDGETS and LAZY_MODULES).
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import plugins
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# files: sheets in the many-files case; items: cost items in the wide-sheet case.
+SCALES = {
+    'small': {'files': 10, 'items': 10, 'draws': 100_000, 'regions': 100, 'report_rows': 1_000, 'reports': 5},
+    'medium': {'files': 1_000, 'items': 1_000, 'draws': 1_000_000, 'regions': 3_000, 'report_rows': 100_000, 'reports': 50},
+    'large': {'files': 100_000, 'items': 10_000, 'draws': 10_000_000, 'regions': 3_000, 'report_rows': 1_000_000, 'reports': 500},
+}
+
+BENCHMARKS = {}
+
+# Modules on the app's start-up path, with the time allowed to import each in a
+# fresh interpreter, and optional dependencies they must not import eagerly.
+IMPORT_BUDGETS = {
+    'utils': 1.0,
+    'data_loader': 1.0,
+    'budget_parser': 1.0,
+}
+LAZY_MODULES = ('weasyprint', 'reportlab', 'xlsxwriter', 'jinja2', 'gspread', 'google.oauth2', 'openpyxl', 'streamlit')
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(seconds)
+print(','.join(name for name in {lazy!r} if name in sys.modules))
+"""
+
+# Items of a typical extension budget, reused (with suffixes) for wide sheets.
+DIRECT_ITEMS = ['Rent', 'Seed', 'Fertilizer', 'Chemical', 'Insurance', 'Drying', 'Fuel', 'Repairs', 'Interest']
+OVERHEAD_ITEMS = ['Depreciation', 'Utilities', 'Misc overhead', 'Labor', 'Management']
+
+
+def benchmark(name, unit):
+    """Register a benchmark. The function gets (config, workdir) and returns (run, units)."""
+    def register(function):
+        BENCHMARKS[name] = (function, unit)
+        return function
+    return register
+
+
+def synthetic_budget_rows(rng, n_items, crop='Corn'):
+    """Rows of a budget sheet in the layout of the sample CSV."""
+    n_direct = max(1, int(n_items * len(DIRECT_ITEMS) / (len(DIRECT_ITEMS) + len(OVERHEAD_ITEMS))))
+    direct = [DIRECT_ITEMS[i % len(DIRECT_ITEMS)] + (f' {i // len(DIRECT_ITEMS)}' if i >= len(DIRECT_ITEMS) else '')
+              for i in range(n_direct)]
+    overhead = [OVERHEAD_ITEMS[i % len(OVERHEAD_ITEMS)] + (f' {i // len(OVERHEAD_ITEMS)}' if i >= len(OVERHEAD_ITEMS) else '')
+                for i in range(max(1, n_items - n_direct))]
+    yield_value = round(float(rng.uniform(40, 220)), 1)
+    price_value = round(float(rng.uniform(3, 14)), 2)
+    direct_values = np.round(rng.uniform(1, 200, len(direct)), 2)
+    overhead_values = np.round(rng.uniform(1, 80, len(overhead)), 2)
+    revenue = yield_value * price_value
+    total = direct_values.sum() + overhead_values.sum()
+    rows = [('Metric', 'Value', 'Unit'), (crop, '', ''), ('Yield', yield_value, 'Bushels'),
+            ('Price', price_value, ''), ('Revenue', round(revenue, 2), '')]
+    rows += [(name, value, '') for name, value in zip(direct, direct_values)]
+    rows += [('Direct costs', round(direct_values.sum(), 2), ''),
+             ('Return over direct', round(revenue - direct_values.sum(), 2), '')]
+    rows += [(name, value, '') for name, value in zip(overhead, overhead_values)]
+    rows += [('Overhead costs', round(overhead_values.sum(), 2), ''),
+             ('Direct & overhead', round(total, 2), ''),
+             ('Net return', round(revenue - total, 2), '')]
+    return rows
+
+
+def write_synthetic_budgets(directory, n_files, n_items=14, file_format='csv', seed=0):
+    """Write n_files synthetic budget sheets and return their paths."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    crops = ['Corn', 'Soybeans', 'Wheat', 'Barley']
+    paths = []
+    for i in range(n_files):
+        rows = synthetic_budget_rows(rng, n_items, crops[i % len(crops)])
+        path = os.path.join(directory, f'budget_{i:06d}.{file_format}')
+        if file_format == 'csv':
+            with open(path, 'w') as f:
+                f.writelines(','.join(str(v) for v in row) + '\n' for row in rows)
+        else:
+            pd.DataFrame(rows).to_excel(path, header=False, index=False)
+        paths.append(path)
+    return paths
+
+
+@benchmark('parse_many_csv', 'files')
+def bench_parse_many_csv(config, workdir):
+    from budget_parser import parse_budget_file
+    paths = write_synthetic_budgets(os.path.join(workdir, 'many_csv'), config['files'])
+    return (lambda: [parse_budget_file(p) for p in paths]), len(paths)
+
+
+@benchmark('parse_xlsx', 'files')
+def bench_parse_xlsx(config, workdir):
+    from budget_parser import parse_budget_file
+    paths = write_synthetic_budgets(os.path.join(workdir, 'xlsx'), min(config['files'], 200), file_format='xlsx')
+    return (lambda: [parse_budget_file(p) for p in paths]), len(paths)
+
+
+@benchmark('parse_wide_sheet', 'cost items')
+def bench_parse_wide_sheet(config, workdir):
+    from budget_parser import parse_budget_file
+    paths = write_synthetic_budgets(os.path.join(workdir, 'wide'), 5, n_items=config['items'])
+    return (lambda: [parse_budget_file(p) for p in paths]), 5 * config['items']
+
+
+def loader_run(workdir, load, paths, warm):
+    """Run of a data_loader function over paths through the budget cache.
+
+    Warm runs read a cache filled during setup; cold runs start every run
+    with an empty cache directory, so each file is parsed and written again.
+    Raises when the loader reports a failure (it returns None).
+    """
+    import budget_cache
+
+    def load_all():
+        results = [load(path) for path in paths]
+        if any(result is None for result in results):
+            raise RuntimeError(f"{load.__name__} failed to load a budget")
+        return results
+
+    if warm:
+        budget_cache.default_cache = budget_cache.BudgetCache(os.path.join(workdir, 'cache', f'{load.__name__}-warm'))
+        load_all()
+        return load_all
+    runs = itertools.count()
+
+    def run():
+        budget_cache.default_cache = budget_cache.BudgetCache(
+            os.path.join(workdir, 'cache', f'{load.__name__}-cold-{next(runs)}'))
+        return load_all()
+    return run
+
+
+def copies_of(path, directory, n):
+    """n copies of a sample file, so each is cached as a separate entry."""
+    os.makedirs(directory, exist_ok=True)
+    name, extension = os.path.splitext(os.path.basename(path))
+    copies = [os.path.join(directory, f'{name}_{i:06d}{extension}') for i in range(n)]
+    for copy in copies:
+        shutil.copyfile(path, copy)
+    return copies
+
+
+def csv_loader_case(config, workdir, warm):
+    import data_loader
+    paths = write_synthetic_budgets(os.path.join(workdir, 'loader_csv'), config['files'])
+    return loader_run(workdir, data_loader.load_csv_data, paths, warm), len(paths)
+
+
+def excel_loader_case(config, workdir, warm):
+    import data_loader
+    paths = write_synthetic_budgets(os.path.join(workdir, 'loader_xlsx'), min(config['files'], 200), file_format='xlsx')
+    return loader_run(workdir, data_loader.load_excel_data, paths, warm), len(paths)
+
+
+def wheat_loader_case(config, workdir, warm):
+    import data_loader
+    sample = os.path.join(os.path.dirname(os.path.abspath(data_loader.__file__)), 'attached_assets', 'Wheat.xlsx')
+    paths = copies_of(sample, os.path.join(workdir, 'loader_wheat'), min(config['files'], 200))
+    return loader_run(workdir, data_loader.load_wheat_data, paths, warm), len(paths)
+
+
+def crop_loader_case(config, workdir, warm):
+    import data_loader
+    crops = ['Corn', 'Soybeans', 'Wheat']
+    return loader_run(workdir, data_loader.load_data, crops, warm), len(crops)
+
+
+@benchmark('load_csv_data_cold_cache', 'files')
+def bench_load_csv_cold(config, workdir):
+    return csv_loader_case(config, workdir, warm=False)
+
+
+@benchmark('load_csv_data_warm_cache', 'files')
+def bench_load_csv_warm(config, workdir):
+    return csv_loader_case(config, workdir, warm=True)
+
+
+@benchmark('load_excel_data_cold_cache', 'files')
+def bench_load_excel_cold(config, workdir):
+    return excel_loader_case(config, workdir, warm=False)
+
+
+@benchmark('load_excel_data_warm_cache', 'files')
+def bench_load_excel_warm(config, workdir):
+    return excel_loader_case(config, workdir, warm=True)
+
+
+@benchmark('load_wheat_data_cold_cache', 'files')
+def bench_load_wheat_cold(config, workdir):
+    return wheat_loader_case(config, workdir, warm=False)
+
+
+@benchmark('load_wheat_data_warm_cache', 'files')
+def bench_load_wheat_warm(config, workdir):
+    return wheat_loader_case(config, workdir, warm=True)
+
+
+@benchmark('load_data_cold_cache', 'crops')
+def bench_load_data_cold(config, workdir):
+    return crop_loader_case(config, workdir, warm=False)
+
+
+@benchmark('load_data_warm_cache', 'crops')
+def bench_load_data_warm(config, workdir):
+    return crop_loader_case(config, workdir, warm=True)
+
+
+@benchmark('profit_per_acre', 'draws')
+def bench_profit_per_acre(config, workdir):
+    from utils import calculate_profit_per_acre
+    rng = np.random.default_rng(0)
+    n = config['draws']
+    yields, prices, costs = rng.uniform(40, 220, n), rng.uniform(3, 14, n), rng.uniform(300, 900, n)
+    return (lambda: calculate_profit_per_acre(yields, prices, costs)), n
+
+
+@benchmark('simulate_profit', 'draws')
+def bench_simulate_profit(config, workdir):
+    from simulation import simulate_profit
+    scenarios = pd.DataFrame({
+        'Crop': ['Corn'], 'Region': ['Midwest'], 'Yield_Mean': [187.0], 'Yield_Std': [28.0],
+        'Price_Mean': [4.25], 'Price_Std': [0.85], 'Cost_Mean': [781.25], 'Cost_Std': [39.0],
+    })
+    n = config['draws']
+    return (lambda: simulate_profit(scenarios, n_draws=n, max_workers=1, seed=0)), n
+
+
+@benchmark('regional_expansion', 'region x item cells')
+def bench_regional_expansion(config, workdir):
+    from regional import RegionalCostModel
+    rng = np.random.default_rng(0)
+    n_items, n_regions = config['items'], config['regions']
+    cost_df = pd.DataFrame({'Cost_Item': [f'Item {i}' for i in range(n_items)], 'Cost_Value': rng.uniform(1, 100, n_items)})
+    table = pd.DataFrame({'Region': [f'County {i}' for i in range(n_regions)], 'Factor': rng.uniform(0.8, 1.2, n_regions)})
+    return (lambda: RegionalCostModel.from_cost_data(cost_df, table).to_frame()), n_items * n_regions
+
+
+@benchmark('excel_report', 'field rows')
+def bench_excel_report(config, workdir):
+    from utils import generate_excel_report
+    n = config['report_rows']
+    crops = ['Corn', 'Soybeans', 'Wheat']
+
+    def fields():
+        for i in range(n):
+            yield (f'F{i}', f'G{i % 500}', crops[i % 3], 'Midwest', 80.0, 180.0, 4.25, 61200.0, 56000.0, 5200.0)
+    output = os.path.join(workdir, 'report.xlsx')
+    return (lambda: generate_excel_report({'fields': fields()}, output)), n
+
+
+def pdf_report_case(config, workdir, engine):
+    from budget_parser import parse_budget_file
+    from utils import generate_pdf_report
+    # Resolve the backend up front so a missing engine is reported as skipped.
+    plugins.report_backend(engine)
+    budget = parse_budget_file(write_synthetic_budgets(os.path.join(workdir, f'pdf_{engine}'), 1)[0])
+    n = config['reports']
+    return (lambda: [generate_pdf_report(budget, engine=engine) for _ in range(n)]), n
+
+
+@benchmark('pdf_reports_reportlab', 'reports')
+def bench_pdf_reports_reportlab(config, workdir):
+    return pdf_report_case(config, workdir, 'reportlab')
+
+
+@benchmark('pdf_reports_weasyprint', 'reports')
+def bench_pdf_reports_weasyprint(config, workdir):
+    return pdf_report_case(config, workdir, 'weasyprint')
+
+
+@benchmark('pdf_batch_reportlab', 'reports')
+def bench_pdf_batch_reportlab(config, workdir):
+    from budget_parser import parse_budget_file
+    from utils import generate_pdf_reports
+    plugins.report_backend('reportlab')
+    budget = parse_budget_file(write_synthetic_budgets(os.path.join(workdir, 'pdf_batch'), 1)[0])
+    reports = [(f'grower_{i}', budget) for i in range(config['reports'])]
+
+    def run():
+        errors = [result['error'] for result in generate_pdf_reports(reports, os.path.join(workdir, 'pdf_out'),
+                                                                      engine='reportlab', max_workers=2)
+                  if result['error']]
+        if errors:
+            raise RuntimeError(errors[0])
+    return run, len(reports)
+
+
+@benchmark('portfolio_store', 'field rows')
+def bench_portfolio_store(config, workdir):
+    import data_loader
+    from budget_model import Budget
+    from portfolio_store import write_store_from_budgets
+    budgets = {crop: data_loader.load_data(crop) for crop in ('Corn', 'Soybeans', 'Wheat')}
+    expected = {crop: Budget.from_result(budget).profit_per_acre for crop, budget in budgets.items()}
+    n = config['report_rows']
+    crops = np.array(list(budgets))[np.arange(n) % len(budgets)]
+    fields = pd.DataFrame({
+        'Field': np.arange(n), 'Grower': np.arange(n) % 500, 'Year': 2025, 'Crop': crops,
+        'Region': 'Midwest', 'Acres': 80.0,
+    })
+    path = os.path.join(workdir, 'portfolio')
+
+    def run():
+        store = write_store_from_budgets(path, fields, budgets)
+        # Round trip: the store and its BudgetBook must reproduce each budget's profit.
+        profit = store.profit_per_acre()
+        book_profit = store.to_budget_book().profit_per_acre()
+        crop_names = np.asarray(store.crops, dtype=object)[np.asarray(store['crop'])]
+        reference = np.array([expected[crop] for crop in crop_names])
+        if not (np.allclose(profit, reference) and np.allclose(book_profit, reference)):
+            raise AssertionError("Portfolio store profit does not match the crop budgets")
+    return run, n
+
+
+def measure(run, units, repeat=1, memory=True):
+    """Best wall time of `repeat` runs, then peak traced memory of one extra run."""
+    seconds = min(_timed(run) for _ in range(repeat))
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+    return {
+        'seconds': seconds,
+        'units': units,
+        'throughput': units / seconds if seconds > 0 else float('inf'),
+        'peak_mb': peak_mb,
+    }
+
+
+def _timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def measure_import(module, repeat=3):
+    """Best import time of module in a fresh interpreter, and the lazy modules it pulled in."""
+    code = IMPORT_PROBE.format(module=module, lazy=LAZY_MODULES)
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, loaded = float('inf'), []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True,
+                                text=True, check=True).stdout.splitlines()
+        best = min(best, float(output[0]))
+        loaded = [name for name in output[1].split(',') if name] if len(output) > 1 else []
+    return {'seconds': best, 'eager_imports': loaded}
+
+
+def check_imports(budgets=IMPORT_BUDGETS, scale=1.0, progress=print):
+    """Measure start-up imports; returns (results, list of budget violations)."""
+    results, problems = {}, []
+    for module, budget in budgets.items():
+        result = results[module] = measure_import(module)
+        progress(f"import {module:<21} {result['seconds']:9.3f} s  (budget {budget * scale:.2f} s)")
+        if result['seconds'] > budget * scale:
+            problems.append(f"import {module}: {result['seconds']:.3f} s > budget {budget * scale:.2f} s")
+        if result['eager_imports']:
+            problems.append(f"import {module}: eagerly imports {', '.join(result['eager_imports'])}")
+    return results, problems
+
+
+def compare(results, baseline, tolerance):
+    """List regressions of results against a baseline."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None or 'throughput' not in result or 'throughput' not in reference:
+            continue
+        if result['units'] != reference['units']:
+            continue
+        if result['throughput'] < reference['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']:.1f} < baseline {reference['throughput']:.1f}")
+        if result.get('peak_mb') is not None and reference.get('peak_mb') is not None:
+            if result['peak_mb'] > reference['peak_mb'] * (1 + tolerance) + 1.0:
+                regressions.append(f"{name}: peak memory {result['peak_mb']:.1f} MB > baseline {reference['peak_mb']:.1f} MB")
+    return regressions
+
+
+def run_benchmarks(config, names=None, repeat=1, memory=True, progress=print):
+    """Run the selected benchmarks in a scratch directory and return their results."""
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='ffo-bench-')
+    try:
+        for name, (function, unit) in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            try:
+                run, units = function(config, workdir)
+            except (ImportError, OSError, plugins.PluginError) as e:
+                # Optional dependencies (e.g. the report backends) may be missing.
+                results[name] = {'skipped': f"{type(e).__name__}: {e}"}
+                progress(f"{name:<28} skipped ({results[name]['skipped']})")
+                continue
+            try:
+                result = measure(run, units, repeat=repeat, memory=memory)
+            except Exception as e:
+                # One broken case is recorded and reported; the others still run.
+                results[name] = {'failed': f"{type(e).__name__}: {e}"}
+                progress(f"{name:<28} FAILED ({results[name]['failed']})")
+                continue
+            result['unit'] = unit
+            results[name] = result
+            peak = f"{result['peak_mb']:8.1f} MB" if result['peak_mb'] is not None else ''
+            progress(f"{name:<28} {result['seconds']:9.3f} s  {result['throughput']:14,.1f} {unit}/s  {peak}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loaders, profit math and report generation.")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--files', type=int, help="Override the number of synthetic budget files")
+    parser.add_argument('--items', type=int, help="Override the number of cost items in wide sheets")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark (best is kept)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the traced peak-memory run")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument('--update-baseline', action='store_true', help="Write this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument('--output', help="Also write this run's results to a JSON file")
+    parser.add_argument('--skip-imports', action='store_true', help="Skip the import-time budget check")
+    parser.add_argument('--import-budget-scale', type=float, default=1.0,
+                        help="Multiply every import-time budget (e.g. 2 on slow machines)")
+    args = parser.parse_args(argv)
+
+    config = dict(SCALES[args.scale])
+    if args.files:
+        config['files'] = args.files
+    if args.items:
+        config['items'] = args.items
+
+    import_problems = []
+    imports = {}
+    if not args.skip_imports:
+        imports, import_problems = check_imports(scale=args.import_budget_scale)
+    results = run_benchmarks(config, names=args.only, repeat=args.repeat, memory=not args.no_memory)
+    record = {
+        'scale': args.scale,
+        'config': config,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        },
+        'recorded': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'imports': imports,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(record, f, indent=2)
+
+    for problem in import_problems:
+        print(f"IMPORT BUDGET {problem}", file=sys.stderr)
+    failures = [f"{name}: {result['failed']}" for name, result in results.items() if 'failed' in result]
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump(record, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 1 if import_problems or failures else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != config:
+        print(f"Baseline was recorded with {baseline.get('config')}; comparing matching benchmarks only.")
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if not regressions:
+        print("No regressions against the baseline.")
+    return 1 if regressions or import_problems or failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
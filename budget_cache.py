@@ -0,0 +1,205 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from budget_parser import CATEGORIES, PARSER_VERSION, expand_regional_costs, parse_budget_file
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'FFO_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'budgets')
+)
+DEFAULT_MAX_BYTES = int(os.environ.get('FFO_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+def _digest(*parts):
+    return hashlib.sha256('\0'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+def file_content_hash(file_path, block_size=1 << 20):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BudgetCache:
+    """Persistent cache of parsed budget sheets stored as NumPy .npz files.
+
+    Entries are keyed by the file path, the SHA-256 of its contents and
+    PARSER_VERSION. A small stat record per path remembers the mtime and size
+    the hash was computed for, so unchanged files are not re-hashed; a changed
+    mtime triggers a re-hash, and a changed hash a re-parse. Every hit touches
+    the entry and its stat record so the directory (entries and stat records
+    alike) can be trimmed least-recently-used first once it grows past
+    max_bytes.
+
+    Parameters:
+    - cache_dir: Directory for the cache files.
+    - max_bytes: Size cap of all cached entries.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _stat_path(self, file_path):
+        return os.path.join(self.cache_dir, f"stat-{_digest(file_path)}.json")
+
+    def _content_hash(self, file_path):
+        """Return the content hash, re-hashing only when mtime or size changed."""
+        stat = os.stat(file_path)
+        stat_path = self._stat_path(file_path)
+        try:
+            with open(stat_path) as f:
+                record = json.load(f)
+            if record['mtime_ns'] == stat.st_mtime_ns and record['size'] == stat.st_size:
+                return record['hash']
+        except (OSError, ValueError, KeyError):
+            pass
+        content_hash = file_content_hash(file_path)
+        record = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'hash': content_hash}
+        self._write_atomic(stat_path, json.dumps(record).encode('utf-8'))
+        return content_hash
+
+    def entry_path(self, file_path, crop_name=None):
+        file_path = os.path.abspath(file_path)
+        key = _digest(file_path, crop_name, self._content_hash(file_path), PARSER_VERSION)
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, file_path, crop_name=None):
+        """Return the parsed budget for file_path, parsing it on a cache miss."""
+        try:
+            entry = self.entry_path(file_path, crop_name)
+        except OSError:
+            # Cache directory not writable: fall back to parsing directly.
+            self.misses += 1
+            instrumentation.count('budget_cache.misses')
+            return parse_budget_file(file_path, crop_name=crop_name)
+        try:
+            with instrumentation.span('budget_cache.load'):
+                result = self._load(entry)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            result = None
+        if result is not None:
+            try:
+                os.utime(entry)
+                os.utime(self._stat_path(file_path))
+            except OSError:
+                # Read-only cache: the hit is still good, only the LRU order is stale.
+                pass
+            self.hits += 1
+            instrumentation.count('budget_cache.hits')
+            return result
+        self.misses += 1
+        instrumentation.count('budget_cache.misses')
+        result = parse_budget_file(file_path, crop_name=crop_name)
+        try:
+            self._write_atomic(entry, self._dump(result))
+            self.evict()
+        except OSError:
+            pass
+        return result
+
+    def _write_atomic(self, path, payload):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _dump(result):
+        cost_df = result['cost_data']
+        totals = result['totals']
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            category=cost_df['Category'].cat.codes.to_numpy(dtype=np.int8),
+            item=cost_df['Cost_Item'].to_numpy(dtype=str),
+            value=cost_df['Cost_Value'].to_numpy(dtype=float),
+            names=np.array([result['crop_name'], result['previous_crop'] or ''], dtype=str),
+            scalars=np.array([result['yield_value'], result['price_value'], result['straw_revenue']], dtype=float),
+            total_names=np.array(list(totals), dtype=str),
+            total_values=np.array(list(totals.values()), dtype=float),
+        )
+        return buffer.getvalue()
+
+    @staticmethod
+    def _load(entry):
+        with np.load(entry, allow_pickle=False) as data:
+            crop_name, previous_crop = data['names'].tolist()
+            yield_value, price_value, straw_revenue = data['scalars'].tolist()
+            cost_df = pd.DataFrame({
+                'Category': pd.Categorical.from_codes(data['category'], dtype=CATEGORIES),
+                'Cost_Item': data['item'],
+                'Cost_Value': data['value'],
+            })
+            totals = dict(zip(data['total_names'].tolist(), data['total_values'].tolist()))
+        crop_df = pd.DataFrame({
+            'Crop': [crop_name],
+            'Yield': [yield_value],
+            'Price': [price_value],
+            'Straw_Revenue': [straw_revenue],
+        })
+        return {
+            'cost_data': cost_df,
+            'crop_data': crop_df,
+            'regional_costs': expand_regional_costs(cost_df),
+            'crop_name': crop_name,
+            'yield_value': yield_value,
+            'price_value': price_value,
+            'straw_revenue': straw_revenue,
+            'previous_crop': previous_crop or None,
+            'totals': totals,
+        }
+
+    def evict(self):
+        """Delete least-recently-used entries and stat records until the cache fits in max_bytes.
+
+        A deleted stat record only costs one re-hash of its file on the next get.
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz') or (entry.name.startswith('stat-') and entry.name.endswith('.json')):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Remove every cached entry and stat record."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(('.npz', '.json')):
+                os.remove(entry.path)
+
+
+default_cache = BudgetCache()
+
+
+def load_budget_cached(file_path, crop_name=None):
+    """Parse a budget file through the default on-disk cache."""
+    return default_cache.get(file_path, crop_name=crop_name)
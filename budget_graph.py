@@ -0,0 +1,176 @@
+import numpy as np
+
+import instrumentation
+from budget_model import CATEGORY_NAMES, Budget
+
+# Derived metrics, named after the budget_parser.ROW_SCHEMA roles of the
+# subtotal rows they mirror: name -> (function, inputs).
+BUDGET_FORMULAS = {
+    'revenue': (lambda y, p, straw: y * p + straw, ('yield', 'price', 'straw')),
+    'return_over_direct': (lambda revenue, direct: revenue - direct, ('revenue', 'direct_total')),
+    'total_cost': (lambda direct, overhead: direct + overhead, ('direct_total', 'overhead_total')),
+    'net_return': (lambda revenue, total: revenue - total, ('revenue', 'total_cost')),
+    'cost_per_unit': (lambda total, y: _per_unit(total, y), ('total_cost', 'yield')),
+    'net_return_per_unit': (lambda net, y: _per_unit(net, y), ('net_return', 'yield')),
+}
+SECTION_NODES = {
+    'Direct Costs': 'direct_total',
+    'Overhead Costs': 'overhead_total',
+}
+
+
+def _per_unit(value, units):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.where(units != 0, value / np.where(units != 0, units, 1.0), np.nan)
+    return result if result.ndim else float(result)
+
+
+class DependencyGraph:
+    """Memoized evaluation graph with dirty propagation.
+
+    Inputs are set with set(); formula nodes are recomputed lazily, and only
+    when one of their inputs changed since the last read. Sum nodes (the
+    subtotals) are kept up to date by adding the change of the edited input,
+    so editing one of thousands of line items costs O(1) for the subtotal.
+    Values may be scalars or NumPy arrays (e.g. one entry per field); arrays
+    broadcast through the formulas.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._formulas = {}
+        self._dirty = set()
+        self._dependents = {}
+        self._sums = {}
+        self.recomputed = 0
+
+    def __contains__(self, name):
+        return name in self._values or name in self._formulas
+
+    def _link(self, name, inputs):
+        for source in inputs:
+            if source not in self:
+                raise KeyError(f"Unknown graph node: {source}")
+            self._dependents.setdefault(source, []).append(name)
+
+    def add_input(self, name, value=0.0):
+        if name in self:
+            raise ValueError(f"Graph node already exists: {name}")
+        self._values[name] = value
+
+    def add_formula(self, name, function, inputs):
+        """Node computed as function(*input values)."""
+        if name in self:
+            raise ValueError(f"Graph node already exists: {name}")
+        self._link(name, inputs)
+        self._formulas[name] = (function, tuple(inputs))
+        self._dirty.add(name)
+
+    def add_sum(self, name, inputs):
+        """Node holding the sum of its inputs, maintained incrementally."""
+        if name in self:
+            raise ValueError(f"Graph node already exists: {name}")
+        inputs = tuple(inputs)
+        self._link(name, inputs)
+        self._sums[name] = inputs
+        self._values[name] = sum((self[source] for source in inputs), 0.0)
+
+    def _mark_dirty(self, node):
+        """Mark node and everything downstream of it dirty."""
+        stack = [node]
+        while stack:
+            name = stack.pop()
+            if name in self._dirty:
+                # Dependents of a dirty node are already dirty.
+                continue
+            self._dirty.add(name)
+            stack.extend(self._dependents.get(name, ()))
+
+    def set(self, name, value):
+        """Change an input; its dependents are recomputed on the next read.
+
+        Pass a new array rather than modifying the current one in place.
+        """
+        if name in self._formulas or name in self._sums:
+            raise ValueError(f"{name} is a derived node and cannot be set")
+        old = self._values[name]
+        self._values[name] = value
+        for node in self._dependents.get(name, ()):
+            if node in self._sums and node not in self._dirty:
+                self._values[node] = self._values[node] + (value - old)
+                for dependent in self._dependents.get(node, ()):
+                    self._mark_dirty(dependent)
+            else:
+                self._mark_dirty(node)
+
+    def update(self, values):
+        for name, value in values.items():
+            self.set(name, value)
+
+    def __getitem__(self, name):
+        if name in self._dirty:
+            if name in self._sums:
+                value = sum((self[source] for source in self._sums[name]), 0.0)
+            else:
+                function, inputs = self._formulas[name]
+                value = function(*(self[source] for source in inputs))
+            self._values[name] = value
+            self._dirty.discard(name)
+            self.recomputed += 1
+            instrumentation.count('budget_graph.recomputed')
+        return self._values[name]
+
+    def values(self, names=None):
+        """Dict of node values (all nodes by default)."""
+        if names is None:
+            names = list(self._values) + [name for name in self._formulas if name not in self._values]
+        return {name: self[name] for name in names}
+
+
+class BudgetGraph(DependencyGraph):
+    """Evaluation graph of one budget's line items and subtotal rows.
+
+    Inputs are 'yield', 'price', 'straw' (other revenue per acre) and every
+    cost item by name. Derived nodes mirror the sheet: direct_total,
+    return_over_direct, overhead_total, total_cost, net_return, cost_per_unit
+    and net_return_per_unit.
+
+        graph = BudgetGraph.from_budget(budget, n_fields=5000)
+        graph.set('Fertilizer', new_fertilizer_per_field)
+        graph['net_return']   # only fertilizer's subtotal chain is recomputed
+    """
+
+    @classmethod
+    def from_budget(cls, budget, n_fields=None):
+        """Build from a budget_model.Budget or a loader result dict.
+
+        With n_fields, every input is an array with one value per field,
+        initialized to the budget's values.
+        """
+        if isinstance(budget, dict):
+            budget = Budget.from_result(budget)
+
+        def initial(value):
+            return value if n_fields is None else np.full(n_fields, value, dtype=float)
+
+        graph = cls()
+        graph.add_input('yield', initial(budget.yield_value))
+        graph.add_input('price', initial(budget.price_value))
+        graph.add_input('straw', initial(budget.other_revenue))
+        sections = {name: [] for name in SECTION_NODES}
+        for name, code, value in zip(budget.cost_items, budget.category_codes, budget.cost_values):
+            if name in graph:
+                graph.set(name, graph[name] + value)
+            else:
+                graph.add_input(name, initial(value))
+            if code >= 0 and name not in sections[CATEGORY_NAMES[code]]:
+                sections[CATEGORY_NAMES[code]].append(name)
+        for section, node in SECTION_NODES.items():
+            graph.add_sum(node, sections[section])
+        for name, (function, inputs) in BUDGET_FORMULAS.items():
+            graph.add_formula(name, function, inputs)
+        return graph
+
+    def metrics(self):
+        """Dict of the derived subtotal metrics."""
+        return self.values(list(SECTION_NODES.values()) + list(BUDGET_FORMULAS))
@@ -0,0 +1,345 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from budget_parser import CATEGORIES, expand_regional_costs
+
+CATEGORY_NAMES = list(CATEGORIES.categories)
+
+
+class StringTable:
+    """Interned strings: every distinct name is stored once and referred to by an int32 code.
+
+    Safe to share between threads: known names are looked up without locking
+    and new names are added under a lock, so each name gets exactly one code.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self._codes = {}
+        self._lock = threading.Lock()
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._codes
+
+    def intern(self, name):
+        """Code of name, adding it to the table if it is new."""
+        code = self._codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(name)
+                if code is None:
+                    # Append before publishing the code, so a reader holding it can decode it.
+                    code = len(self.names)
+                    self.names.append(name)
+                    self._codes[name] = code
+        return code
+
+    def code(self, name):
+        """Code of an existing name, -1 when the name is unknown."""
+        return self._codes.get(name, -1)
+
+    def encode(self, names):
+        intern = self.intern
+        return np.fromiter((intern(name) for name in names), dtype=np.int32, count=len(names))
+
+    def decode(self, codes):
+        return np.asarray(self.names, dtype=object)[np.asarray(codes, dtype=np.intp)]
+
+
+# Shared by every budget unless a table is passed explicitly, so cost-item codes
+# are comparable across budgets. Bulk paths (BudgetBook.from_dataset,
+# PortfolioStore.to_budget_book) use their own tables so these stay small.
+COST_ITEMS = StringTable()
+CROPS = StringTable()
+
+
+def _category_codes(categories):
+    """int8 codes into CATEGORY_NAMES, -1 for anything else."""
+    return pd.Categorical(categories, categories=CATEGORY_NAMES).codes.astype(np.int8)
+
+
+def _float(value):
+    return np.nan if value is None or pd.isna(value) else float(value)
+
+
+class Budget:
+    """One crop budget: a small typed header plus array-backed cost vectors.
+
+    Cost items are int32 codes into a shared StringTable, categories are int8
+    codes into CATEGORY_NAMES and values are float64 $/acre. The arrays may be
+    views into a BudgetBook.
+    """
+
+    __slots__ = ('crop', 'region', 'yield_value', 'price_value', 'other_revenue', 'previous_crop',
+                 'item_codes', 'category_codes', 'cost_values', 'items')
+
+    def __init__(self, crop, yield_value, price_value, item_codes, category_codes, cost_values,
+                 other_revenue=0.0, previous_crop=None, region=None, items=COST_ITEMS):
+        self.crop = crop
+        self.region = region
+        self.yield_value = _float(yield_value)
+        self.price_value = _float(price_value)
+        self.other_revenue = 0.0 if pd.isna(other_revenue) else float(other_revenue)
+        self.previous_crop = previous_crop
+        self.item_codes = np.asarray(item_codes, dtype=np.int32)
+        self.category_codes = np.asarray(category_codes, dtype=np.int8)
+        self.cost_values = np.asarray(cost_values, dtype=float)
+        self.items = items
+
+    @classmethod
+    def from_result(cls, result, region=None, items=COST_ITEMS):
+        """Build from a loader result (data_loader.load_data / budget_parser.parse_budget_frame)."""
+        cost_df = result['cost_data']
+        crop_row = result['crop_data'].iloc[0]
+        return cls(
+            crop=result.get('crop_name', crop_row.get('Crop')),
+            yield_value=result.get('yield_value', crop_row.get('Yield')),
+            price_value=result.get('price_value', crop_row.get('Price')),
+            item_codes=items.encode(cost_df['Cost_Item'].to_numpy(dtype=object)),
+            category_codes=_category_codes(cost_df['Category']),
+            cost_values=cost_df['Cost_Value'].to_numpy(dtype=float),
+            other_revenue=result.get('straw_revenue', crop_row.get('Straw_Revenue', 0.0)),
+            previous_crop=result.get('previous_crop'),
+            region=region,
+            items=items,
+        )
+
+    @classmethod
+    def from_fallback(cls, fallback, crop, region=None, items=COST_ITEMS):
+        """Build from utils.create_fallback_data tables (Item / Avg_Yield / Current_Price)."""
+        crop_row = fallback['crop_data'].set_index('Crop').loc[crop]
+        cost_df = fallback['cost_data']
+        regional = fallback['regional_costs']
+        if region is None:
+            region = regional['Region'].iloc[0]
+        values = regional[regional['Region'] == region].set_index('Cost_Item')['Cost_Value']
+        return cls(
+            crop=crop,
+            yield_value=crop_row['Avg_Yield'],
+            price_value=crop_row['Current_Price'],
+            item_codes=items.encode(cost_df['Item'].to_numpy(dtype=object)),
+            category_codes=_category_codes(cost_df['Category']),
+            cost_values=values.reindex(cost_df['Item']).fillna(0.0).to_numpy(dtype=float),
+            region=region,
+            items=items,
+        )
+
+    def __len__(self):
+        return len(self.cost_values)
+
+    def __repr__(self):
+        return (f"Budget(crop={self.crop!r}, region={self.region!r}, items={len(self)}, "
+                f"yield={self.yield_value:g}, price={self.price_value:g}, total_cost={self.total_cost:.2f})")
+
+    @property
+    def cost_items(self):
+        return self.items.decode(self.item_codes)
+
+    @property
+    def total_cost(self):
+        return float(self.cost_values.sum())
+
+    @property
+    def revenue(self):
+        return self.yield_value * self.price_value + self.other_revenue
+
+    @property
+    def profit_per_acre(self):
+        return self.revenue - self.total_cost
+
+    def category_totals(self):
+        """Cost per acre of each category, in CATEGORY_NAMES order."""
+        valid = self.category_codes >= 0
+        return np.bincount(self.category_codes[valid], weights=self.cost_values[valid],
+                           minlength=len(CATEGORY_NAMES))
+
+    def cost_frame(self):
+        """Category / Cost_Item / Cost_Value frame, as the loaders return."""
+        return pd.DataFrame({
+            'Category': pd.Categorical.from_codes(self.category_codes, dtype=CATEGORIES),
+            'Cost_Item': self.cost_items,
+            'Cost_Value': self.cost_values,
+        })
+
+    def to_result(self):
+        """Loader-style dict (the keys of budget_parser.parse_budget_frame)."""
+        cost_df = self.cost_frame()
+        return {
+            'cost_data': cost_df,
+            'crop_data': pd.DataFrame({
+                'Crop': [self.crop],
+                'Yield': [self.yield_value],
+                'Price': [self.price_value],
+                'Straw_Revenue': [self.other_revenue],
+            }),
+            'regional_costs': expand_regional_costs(cost_df),
+            'crop_name': self.crop,
+            'yield_value': self.yield_value,
+            'price_value': self.price_value,
+            'straw_revenue': self.other_revenue,
+            'previous_crop': self.previous_crop,
+        }
+
+
+class BudgetBook:
+    """Many budgets stored column-wise.
+
+    Headers are arrays with one entry per budget (crop and region as codes).
+    Cost rows of all budgets are concatenated, and budget i owns the rows
+    offsets[i]:offsets[i + 1] (compressed sparse row layout), so a 50k-budget
+    portfolio is a handful of flat arrays and cross-budget sums are single
+    bincount calls.
+    """
+
+    def __init__(self, crop_codes, region_codes, yields, prices, other_revenue, offsets,
+                 item_codes, category_codes, cost_values, items=COST_ITEMS, crops=CROPS, regions=None):
+        self.crop_codes = np.asarray(crop_codes, dtype=np.int32)
+        self.region_codes = np.asarray(region_codes, dtype=np.int32)
+        self.yields = np.asarray(yields, dtype=float)
+        self.prices = np.asarray(prices, dtype=float)
+        self.other_revenue = np.asarray(other_revenue, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.item_codes = np.asarray(item_codes, dtype=np.int32)
+        self.category_codes = np.asarray(category_codes, dtype=np.int8)
+        self.cost_values = np.asarray(cost_values, dtype=float)
+        self.items = items
+        self.crops = crops
+        self.regions = regions if regions is not None else StringTable()
+        # Source file of each budget, when built from an ingest dataset.
+        self.sources = None
+
+    @classmethod
+    def from_budgets(cls, budgets, items=COST_ITEMS, crops=CROPS):
+        """Pack Budget objects (all sharing `items`) into one book."""
+        budgets = list(budgets)
+        regions = StringTable()
+        if any(budget.items is not items for budget in budgets):
+            raise ValueError("All budgets must share the book's cost-item table")
+        lengths = np.fromiter((len(budget) for budget in budgets), dtype=np.int64, count=len(budgets))
+        return cls(
+            crop_codes=crops.encode([budget.crop for budget in budgets]),
+            region_codes=regions.encode([budget.region for budget in budgets]),
+            yields=[budget.yield_value for budget in budgets],
+            prices=[budget.price_value for budget in budgets],
+            other_revenue=[budget.other_revenue for budget in budgets],
+            offsets=np.concatenate([[0], np.cumsum(lengths)]),
+            item_codes=np.concatenate([budget.item_codes for budget in budgets] or [np.empty(0, np.int32)]),
+            category_codes=np.concatenate([budget.category_codes for budget in budgets] or [np.empty(0, np.int8)]),
+            cost_values=np.concatenate([budget.cost_values for budget in budgets] or [np.empty(0)]),
+            items=items,
+            crops=crops,
+            regions=regions,
+        )
+
+    @classmethod
+    def from_dataset(cls, dataset, items=None, crops=None):
+        """Build from the long-format dataset written by ingest.py (one budget per Source).
+
+        Ingested sheets can name any number of cost items, so the book gets new
+        item and crop tables unless shared ones are passed. Sources with no rows
+        (e.g. after filtering a categorical dataset) are left out.
+        """
+        items = items if items is not None else StringTable()
+        crops = crops if crops is not None else StringTable()
+        sources = pd.Categorical(dataset['Source']).remove_unused_categories()
+        order = np.argsort(sources.codes, kind='stable')
+        rows = dataset.iloc[order]
+        lengths = np.bincount(sources.codes, minlength=len(sources.categories))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        first = offsets[:-1]
+        regions = StringTable()
+        if 'Other_Revenue' in rows:
+            other_revenue = np.nan_to_num(rows['Other_Revenue'].to_numpy(dtype=float)[first])
+        else:
+            # Datasets written before ingest recorded other revenue.
+            other_revenue = np.zeros(len(first))
+        book = cls(
+            crop_codes=crops.encode(rows['Crop'].to_numpy(dtype=object)[first]),
+            region_codes=regions.encode(rows['Region'].to_numpy(dtype=object)[first]),
+            yields=rows['Yield'].to_numpy(dtype=float)[first],
+            prices=rows['Price'].to_numpy(dtype=float)[first],
+            other_revenue=other_revenue,
+            offsets=offsets,
+            item_codes=items.encode(rows['Cost_Item'].to_numpy(dtype=object)),
+            category_codes=_category_codes(rows['Category']),
+            cost_values=rows['Cost_Value'].to_numpy(dtype=float),
+            items=items,
+            crops=crops,
+            regions=regions,
+        )
+        book.sources = np.asarray(sources.categories, dtype=object)
+        return book
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        """Budget i; its cost arrays are views into the book."""
+        if i < 0:
+            i += len(self)
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return Budget(
+            crop=self.crops.names[self.crop_codes[i]],
+            region=self.regions.names[self.region_codes[i]],
+            yield_value=self.yields[i],
+            price_value=self.prices[i],
+            item_codes=self.item_codes[start:stop],
+            category_codes=self.category_codes[start:stop],
+            cost_values=self.cost_values[start:stop],
+            other_revenue=self.other_revenue[i],
+            items=self.items,
+        )
+
+    @property
+    def nbytes(self):
+        arrays = (self.crop_codes, self.region_codes, self.yields, self.prices, self.other_revenue,
+                  self.offsets, self.item_codes, self.category_codes, self.cost_values)
+        return sum(array.nbytes for array in arrays)
+
+    def row_budgets(self):
+        """Budget index of every cost row."""
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def total_costs(self):
+        return np.bincount(self.row_budgets(), weights=self.cost_values, minlength=len(self))
+
+    def revenue(self):
+        return self.yields * self.prices + self.other_revenue
+
+    def profit_per_acre(self):
+        return self.revenue() - self.total_costs()
+
+    def category_totals(self):
+        """(n_budgets, n_categories) cost per acre of each category."""
+        valid = self.category_codes >= 0
+        n_categories = len(CATEGORY_NAMES)
+        cells = self.row_budgets()[valid] * n_categories + self.category_codes[valid]
+        totals = np.bincount(cells, weights=self.cost_values[valid], minlength=len(self) * n_categories)
+        return totals.reshape(len(self), n_categories)
+
+    def item_values(self, name):
+        """Cost per acre of one cost item in every budget (0 where it is absent)."""
+        code = self.items.code(name)
+        rows = np.flatnonzero(self.item_codes == code)
+        return np.bincount(self.row_budgets()[rows], weights=self.cost_values[rows], minlength=len(self))
+
+    def summary(self):
+        """One row per budget: Crop, Region, Yield, Price, category totals, Total_Cost, Profit."""
+        frame = pd.DataFrame({
+            'Crop': self.crops.decode(self.crop_codes),
+            'Region': self.regions.decode(self.region_codes),
+            'Yield': self.yields,
+            'Price': self.prices,
+        })
+        for name, totals in zip(CATEGORY_NAMES, self.category_totals().T):
+            frame[name] = totals
+        frame['Total_Cost'] = self.total_costs()
+        frame['Profit'] = self.revenue() - frame['Total_Cost'].to_numpy()
+        return frame
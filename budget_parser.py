@@ -0,0 +1,167 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from regional import RegionalCostModel
+
+# Bump whenever the parsed output changes so cached results are invalidated.
+PARSER_VERSION = 1
+
+# Declarative row schema: role -> pattern matched against the lower-cased row
+# label. Order matters; the first matching role wins. Labelled rows that match
+# no role are cost items (or the sheet title when they come before the yield).
+ROW_SCHEMA = [
+    ('header', r'^metric$'),
+    ('yield', r'^yield\b'),
+    ('price', r'^price\b'),
+    ('straw', r'^straw\b'),
+    ('revenue', r'^re[nv]enue\b'),
+    ('direct_total', r'^direct costs?$'),
+    ('return_over_direct', r'^return over direct\b'),
+    ('overhead_total', r'^overhead costs?$'),
+    ('total_cost', r'^direct\s*&'),
+    ('net_return_per_unit', r'^net return per\b'),
+    ('cost_per_unit', r'^total cost per\b'),
+    ('net_return', r'^net return\b'),
+]
+
+# Subtotal rows that close a section: items above them belong to that section.
+SECTION_TOTALS = {
+    'direct_total': 'Direct Costs',
+    'overhead_total': 'Overhead Costs',
+}
+
+# Titles such as "Corn following corn" carry the previous crop of the field.
+TITLE_PATTERN = r'^(?P<crop>.+?)(?:\s+following\s+(?P<previous>.+))?$'
+
+CATEGORIES = pd.CategoricalDtype(list(SECTION_TOTALS.values()))
+
+_ROLE_PATTERN = '|'.join(f'(?P<{role}>{pattern})' for role, pattern in ROW_SCHEMA)
+
+
+class BudgetParseError(ValueError):
+    """Raised when a sheet does not look like a crop budget."""
+
+
+def read_budget_sheet(file_path, sheet_name=0):
+    """Read a CSV or XLSX budget sheet as a raw frame without a header row.
+
+    Only the label and value columns of a CSV are read, so rows with extra
+    trailing fields (notes, units) do not make the sheet ragged.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.csv':
+        return pd.read_csv(file_path, header=None, names=[0, 1], usecols=[0, 1], dtype=str,
+                           skip_blank_lines=False)
+    if extension in ('.xlsx', '.xlsm', '.xls'):
+        return pd.read_excel(file_path, sheet_name=sheet_name, header=None)
+    raise BudgetParseError(f"Unsupported budget file type: {extension}")
+
+
+def parse_values(column):
+    """Parse dollar amounts: strip '$', ',' and spaces, NaN when not numeric."""
+    if pd.api.types.is_numeric_dtype(column):
+        return column.astype(float)
+    cleaned = column.astype('string').str.replace(r'[$,\s]', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce').astype(float)
+
+
+def classify_rows(labels):
+    """Return the schema role of every row label (NaN for items and blank rows)."""
+    matches = labels.str.lower().str.extract(_ROLE_PATTERN)
+    matched = matches.notna()
+    return matched.idxmax(axis=1).where(matched.any(axis=1))
+
+
+def parse_budget_frame(raw, crop_name=None):
+    """Parse a raw budget sheet into typed columnar frames.
+
+    Parameters:
+    - raw: Frame with row labels in the first column and values in the second.
+    - crop_name: Crop name to use instead of the one in the sheet title.
+
+    Returns:
+    Dict with 'cost_data', 'crop_data', 'regional_costs', 'crop_name',
+    'yield_value', 'price_value', 'straw_revenue', 'previous_crop' and
+    'totals' (the subtotal rows reported in the sheet).
+    """
+    if raw.shape[1] < 2:
+        raise BudgetParseError("Budget sheet needs a label column and a value column")
+    labels = raw.iloc[:, 0].astype('string').str.strip().replace('', pd.NA)
+    values = parse_values(raw.iloc[:, 1])
+    roles = classify_rows(labels)
+
+    has_label = labels.notna().to_numpy()
+    is_item = has_label & roles.isna().to_numpy()
+    first_input = np.flatnonzero(roles.isin(['yield', 'price']).to_numpy())
+    if len(first_input) == 0:
+        raise BudgetParseError("Budget sheet has no Yield or Price row")
+    before_inputs = np.arange(len(labels)) < first_input[0]
+    is_title = is_item & before_inputs
+    is_item &= ~before_inputs
+
+    # Each item belongs to the section whose subtotal row comes next below it.
+    section = roles.where(roles.isin(list(SECTION_TOTALS))).bfill().map(SECTION_TOTALS)
+    is_item &= section.notna().to_numpy()
+    if not is_item.any():
+        raise BudgetParseError("Budget sheet has no cost items above a subtotal row")
+
+    role_values = values[roles.notna().to_numpy()].groupby(roles.dropna(), sort=False).first()
+    yield_value = role_values.get('yield', np.nan)
+    price_value = role_values.get('price', np.nan)
+    straw_revenue = role_values.get('straw', np.nan)
+
+    previous_crop = None
+    if is_title.any():
+        title = labels[is_title].iloc[0]
+        parts = pd.Series([title]).str.extract(TITLE_PATTERN).iloc[0]
+        if crop_name is None:
+            crop_name = parts['crop']
+        if pd.notna(parts['previous']):
+            previous_crop = parts['previous'].capitalize()
+    if crop_name is None:
+        raise BudgetParseError("Budget sheet has no crop title")
+
+    cost_df = pd.DataFrame({
+        'Category': pd.Categorical(section[is_item], dtype=CATEGORIES),
+        'Cost_Item': labels[is_item].astype(str).to_numpy(),
+        'Cost_Value': values[is_item].fillna(0.0).to_numpy(),
+    })
+    crop_df = pd.DataFrame({
+        'Crop': [crop_name],
+        'Yield': [yield_value],
+        'Price': [price_value],
+        'Straw_Revenue': [straw_revenue],
+    })
+    return {
+        'cost_data': cost_df,
+        'crop_data': crop_df,
+        'regional_costs': expand_regional_costs(cost_df),
+        'crop_name': crop_name,
+        'yield_value': yield_value,
+        'price_value': price_value,
+        'straw_revenue': straw_revenue,
+        'previous_crop': previous_crop,
+        'totals': role_values.drop(['header', 'yield', 'price', 'straw'], errors='ignore').to_dict(),
+    }
+
+
+def expand_regional_costs(cost_df, regions=None):
+    """Long-format regional costs: every cost item scaled by each region factor.
+
+    See RegionalCostModel.from_cost_data for the accepted regions.
+    """
+    with instrumentation.span('parse.regional_expand'):
+        return RegionalCostModel.from_cost_data(cost_df, regions).to_frame()
+
+
+def parse_budget_file(file_path, crop_name=None, sheet_name=0):
+    """Read and parse one CSV or XLSX budget sheet. See parse_budget_frame."""
+    with instrumentation.span('parse.read'):
+        raw = read_budget_sheet(file_path, sheet_name=sheet_name)
+    instrumentation.count('parse.files')
+    instrumentation.count('parse.rows', len(raw))
+    with instrumentation.span('parse.frame'):
+        return parse_budget_frame(raw, crop_name=crop_name)
@@ -0,0 +1,250 @@
+"""Headless bulk import of crop budget sheets.
+
+Walks a directory tree of budget CSV/XLSX files, parses them in a process pool
+and writes one consolidated columnar dataset (crop x region x cost item x year)
+plus a JSON report of per-file timings and failures.
+
+Usage:
+    python ingest.py budgets/ --output budgets.npz --report ingest_report.json
+
+The first directory below the root is taken as the region and a four digit
+year anywhere in the relative path as the year, e.g. budgets/Iowa/2025/corn.csv.
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from budget_parser import parse_budget_file
+
+BUDGET_EXTENSIONS = ('.csv', '.xlsx', '.xlsm')
+YEAR_PATTERN = re.compile(r'(?<!\d)((?:19|20)\d\d)(?!\d)')
+COLUMNS = ['Source', 'Crop', 'Region', 'Year', 'Category', 'Cost_Item', 'Cost_Value', 'Yield', 'Price',
+           'Other_Revenue']
+# Columns added after the first dataset version, with the value used when
+# reading a dataset written without them.
+OPTIONAL_COLUMNS = {'Other_Revenue': 0.0}
+
+
+def find_budget_files(root):
+    """Yield budget files below root in a stable order."""
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(BUDGET_EXTENSIONS) and not name.startswith('~$'):
+                yield os.path.join(directory, name)
+
+
+def describe_path(path, root, default_region, default_year):
+    """Region and year of a budget file from its location below root."""
+    relative = os.path.relpath(path, root)
+    parts = relative.split(os.sep)
+    region = parts[0] if len(parts) > 1 else default_region
+    years = YEAR_PATTERN.findall(relative)
+    year = int(years[-1]) if years else default_year
+    return relative, region, year
+
+
+def ingest_file(task):
+    """Parse one budget file in a worker process.
+
+    Returns:
+    Dict with 'path', 'status', 'seconds', 'rows' and either 'columns'
+    (the long-format cost rows as arrays) or 'error'.
+    """
+    path, root, default_region, default_year, use_cache = task
+    relative, region, year = describe_path(path, root, default_region, default_year)
+    start = time.perf_counter()
+    try:
+        if use_cache:
+            from budget_cache import load_budget_cached
+            budget = load_budget_cached(path)
+        else:
+            budget = parse_budget_file(path)
+    except Exception as e:
+        return {
+            'path': relative,
+            'status': 'failed',
+            'seconds': time.perf_counter() - start,
+            'rows': 0,
+            'error': f"{type(e).__name__}: {e}",
+        }
+    cost_df = budget['cost_data']
+    n_rows = len(cost_df)
+    columns = {
+        'Source': np.full(n_rows, relative, dtype=object),
+        'Crop': np.full(n_rows, budget['crop_name'], dtype=object),
+        'Region': np.full(n_rows, region, dtype=object),
+        'Year': np.full(n_rows, year, dtype=np.int16),
+        'Category': cost_df['Category'].astype(str).to_numpy(dtype=object),
+        'Cost_Item': cost_df['Cost_Item'].to_numpy(dtype=object),
+        'Cost_Value': cost_df['Cost_Value'].to_numpy(dtype=float),
+        'Yield': np.full(n_rows, budget['yield_value'], dtype=float),
+        'Price': np.full(n_rows, budget['price_value'], dtype=float),
+        # Revenue not tied to yield x price (e.g. straw), per acre; 0 when the sheet has none.
+        'Other_Revenue': np.full(n_rows, np.nan_to_num(budget.get('straw_revenue', np.nan)), dtype=float),
+    }
+    return {
+        'path': relative,
+        'status': 'ok',
+        'seconds': time.perf_counter() - start,
+        'rows': n_rows,
+        'columns': columns,
+    }
+
+
+def run_ingest(root, workers=None, max_pending=None, default_region='Unknown',
+               default_year=None, use_cache=False, progress=None):
+    """Parse every budget file below root in a process pool.
+
+    At most max_pending files are in flight at once, so memory stays bounded
+    by the pool rather than by the size of the directory tree.
+
+    Returns:
+    Tuple of (consolidated DataFrame with categorical string columns,
+    list of per-file report dicts).
+    """
+    workers = workers or os.cpu_count()
+    max_pending = max_pending or workers * 4
+    default_year = default_year or datetime.date.today().year
+    tasks = ((path, root, default_region, default_year, use_cache) for path in find_budget_files(root))
+
+    chunks = {name: [] for name in COLUMNS}
+    report = []
+
+    def collect(outcome):
+        columns = outcome.pop('columns', None)
+        if columns is not None:
+            for name in COLUMNS:
+                chunks[name].append(columns[name])
+        report.append(outcome)
+        if progress is not None:
+            progress(outcome)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for task in tasks:
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future.result())
+            pending.add(executor.submit(ingest_file, task))
+        for future in wait(pending).done:
+            collect(future.result())
+
+    data = {}
+    for name in COLUMNS:
+        values = np.concatenate(chunks[name]) if chunks[name] else np.array([], dtype=object)
+        data[name] = pd.Categorical(values) if values.dtype == object else values
+    report.sort(key=lambda outcome: outcome['path'])
+    return pd.DataFrame(data), report
+
+
+def _require_parquet():
+    if importlib.util.find_spec('pyarrow') is None:
+        raise ImportError("Parquet datasets need pyarrow (pip install pyarrow); "
+                          "use a .npz output path to work without it")
+
+
+def write_dataset(dataset, output_path):
+    """Write the consolidated dataset as Parquet (.parquet, needs pyarrow) or NumPy .npz.
+
+    In the .npz layout every categorical column is stored as integer codes
+    plus a '<column>__categories' array.
+    """
+    if output_path.endswith('.parquet'):
+        _require_parquet()
+        dataset.to_parquet(output_path, index=False, engine='pyarrow')
+        return
+    arrays = {}
+    for name in dataset.columns:
+        column = dataset[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            arrays[name] = column.cat.codes.to_numpy()
+            arrays[f'{name}__categories'] = column.cat.categories.to_numpy(dtype=str)
+        else:
+            arrays[name] = column.to_numpy()
+    np.savez_compressed(output_path, **arrays)
+
+
+def read_dataset(path):
+    """Read a dataset written by write_dataset."""
+    if path.endswith('.parquet'):
+        _require_parquet()
+        dataset = pd.read_parquet(path, engine='pyarrow')
+        for name, default in OPTIONAL_COLUMNS.items():
+            if name not in dataset:
+                dataset[name] = default
+        return dataset[COLUMNS]
+    with np.load(path, allow_pickle=False) as arrays:
+        data = {}
+        for name in COLUMNS:
+            if f'{name}__categories' in arrays:
+                data[name] = pd.Categorical.from_codes(arrays[name], arrays[f'{name}__categories'])
+            elif name in arrays:
+                data[name] = arrays[name]
+            else:
+                data[name] = np.full(len(arrays['Source']), OPTIONAL_COLUMNS[name], dtype=float)
+    return pd.DataFrame(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import crop budget sheets into one columnar dataset.")
+    parser.add_argument('root', help="Directory tree of budget CSV/XLSX files")
+    parser.add_argument('--output', default='budgets.npz', help="Output dataset (.npz or .parquet)")
+    parser.add_argument('--report', default='ingest_report.json', help="Per-file timing and failure report (JSON)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--max-pending', type=int, default=None, help="Files in flight at once (default: 4 per worker)")
+    parser.add_argument('--region', default='Unknown', help="Region for files directly under the root")
+    parser.add_argument('--year', type=int, default=None, help="Year for paths without one (default: this year)")
+    parser.add_argument('--use-cache', action='store_true', help="Reuse the on-disk parse cache")
+    parser.add_argument('--quiet', action='store_true', help="Do not print per-file progress")
+    args = parser.parse_args(argv)
+
+    def progress(outcome):
+        if not args.quiet:
+            detail = outcome.get('error') or f"{outcome['rows']} rows"
+            print(f"{outcome['status']:>6}  {outcome['seconds'] * 1000:8.1f} ms  {outcome['path']}  ({detail})")
+
+    start = time.perf_counter()
+    dataset, report = run_ingest(
+        args.root,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        default_region=args.region,
+        default_year=args.year,
+        use_cache=args.use_cache,
+        progress=progress,
+    )
+    write_dataset(dataset, args.output)
+    elapsed = time.perf_counter() - start
+
+    failures = [outcome for outcome in report if outcome['status'] != 'ok']
+    summary = {
+        'files': len(report),
+        'parsed': len(report) - len(failures),
+        'failed': len(failures),
+        'rows': len(dataset),
+        'seconds': elapsed,
+        'output': args.output,
+    }
+    with open(args.report, 'w') as f:
+        json.dump({'summary': summary, 'files': report}, f, indent=2)
+
+    print(f"Parsed {summary['parsed']} of {summary['files']} files ({summary['rows']} rows) "
+          f"in {elapsed:.1f}s -> {args.output}")
+    for outcome in failures:
+        print(f"FAILED {outcome['path']}: {outcome['error']}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
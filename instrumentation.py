@@ -0,0 +1,259 @@
+"""Lightweight timing spans, counters and opt-in profiling for the hot paths.
+
+Disabled by default; set FFO_INSTRUMENT=1 (or call enable()) to record. When
+disabled, span() returns a shared no-op context manager and count() returns
+immediately, so instrumented code pays one flag check per call.
+
+    with instrumentation.span('parse.read'):
+        raw = read_budget_sheet(path)
+    instrumentation.count('parse.rows', len(raw))
+
+Recorded data can be exported with to_json() / to_prometheus() or shown in the
+app's diagnostics panel (open the app with ?diagnostics=1).
+
+Recording can also be scoped to one thread or task instead of the process:
+use(Recorder()) sends everything recorded in the current context to that
+recorder (the app keeps one per session), and use(None) stops it again.
+"""
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_enabled = os.environ.get('FFO_INSTRUMENT', '').lower() not in ('', '0', 'false', 'no')
+
+MAX_PROFILES = 5
+
+
+class Recorder:
+    """Spans, counters and profiles recorded by one process, session or run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> [count, total seconds, max seconds]
+        self._spans = {}
+        self._counters = {}
+        self._profiles = []
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                self._spans[name] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                if seconds > stats[2]:
+                    stats[2] = seconds
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_profile(self, captured):
+        with self._lock:
+            self._profiles.append(captured)
+            del self._profiles[:-MAX_PROFILES]
+
+    def profiles(self):
+        with self._lock:
+            return list(self._profiles)
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self._profiles.clear()
+
+    def snapshot(self):
+        with self._lock:
+            spans = {
+                name: {'count': n, 'total': total, 'mean': total / n, 'max': longest}
+                for name, (n, total, longest) in self._spans.items()
+            }
+            return {'spans': spans, 'counters': dict(self._counters)}
+
+
+# Process-wide recorder, used when enabled and no scoped recorder is active.
+_process = Recorder()
+_scoped = ContextVar('instrumentation_recorder', default=None)
+
+
+def enabled():
+    return _active() is not None
+
+
+def enable(flag=True):
+    """Turn process-wide recording on or off."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+def use(recorder):
+    """Record into recorder in the current thread or task; None falls back to the process-wide setting."""
+    _scoped.set(recorder)
+
+
+def _active():
+    recorder = _scoped.get()
+    if recorder is not None:
+        return recorder
+    return _process if _enabled else None
+
+
+def _current():
+    # Recorder read by the export functions: the scoped one, else the process-wide one.
+    recorder = _scoped.get()
+    return recorder if recorder is not None else _process
+
+
+def reset():
+    """Forget all spans, counters and profiles of the current recorder."""
+    _current().reset()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'recorder', 'start')
+
+    def __init__(self, name, recorder):
+        self.name = name
+        self.recorder = recorder
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Context manager timing the enclosed block under name."""
+    recorder = _active()
+    return _Span(name, recorder) if recorder is not None else _NULL_SPAN
+
+
+def record(name, seconds):
+    """Add one timing of `seconds` to the span called name."""
+    recorder = _active()
+    if recorder is not None:
+        recorder.record(name, seconds)
+
+
+def count(name, value=1):
+    """Increment the counter called name."""
+    recorder = _active()
+    if recorder is not None:
+        recorder.count(name, value)
+
+
+def timed(name=None):
+    """Decorator timing every call of a function as a span."""
+    def decorate(function):
+        span_name = name or f'{function.__module__}.{function.__qualname__}'
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            recorder = _active()
+            if recorder is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                recorder.record(span_name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def profile(label='request', sort='cumulative', limit=40):
+    """Capture a cProfile of the enclosed block.
+
+    The formatted stats are kept by the current recorder (the last
+    MAX_PROFILES captures) and returned by profiles(). Profiling works whether
+    or not recording is enabled.
+    """
+    recorder = _current()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+        recorder.add_profile({
+            'label': label,
+            'seconds': time.perf_counter() - start,
+            'recorded': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'stats': output.getvalue(),
+        })
+
+
+def profiles():
+    return _current().profiles()
+
+
+def snapshot():
+    """Recorded data as a dict of 'spans' (count/total/mean/max seconds) and 'counters'."""
+    return _current().snapshot()
+
+
+def to_json(path=None):
+    """Snapshot as JSON text; also written to path when given."""
+    text = json.dumps(snapshot(), indent=2, sort_keys=True)
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def to_prometheus(path=None, prefix='ffo'):
+    """Snapshot in the Prometheus text exposition format; also written to path when given."""
+    data = snapshot()
+    lines = [
+        f'# TYPE {prefix}_span_seconds summary',
+    ]
+    for name, stats in sorted(data['spans'].items()):
+        label = f'span="{name}"'
+        lines.append(f'{prefix}_span_seconds_count{{{label}}} {stats["count"]}')
+        lines.append(f'{prefix}_span_seconds_sum{{{label}}} {stats["total"]:.9f}')
+    lines.append(f'# TYPE {prefix}_span_seconds_max gauge')
+    for name, stats in sorted(data['spans'].items()):
+        lines.append(f'{prefix}_span_seconds_max{{span="{name}"}} {stats["max"]:.9f}')
+    for name, value in sorted(data['counters'].items()):
+        metric = f'{prefix}_{_metric_name(name)}_total'
+        lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric} {value}')
+    text = '\n'.join(lines) + '\n'
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
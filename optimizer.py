@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+import pulp
+
+import instrumentation
+
+
+class AllocationModel:
+    """Linear programme that allocates the acres of each field to crops.
+
+    The model is built once from NumPy arrays. The set_* methods change a single
+    input in place (objective coefficients, right-hand sides or one constraint),
+    and solve() re-runs CBC warm-started from the previous allocation, so a
+    sidebar change never rebuilds the whole problem.
+
+    Parameters:
+    - crops: List of crop names (one column per crop).
+    - field_acres: Acres available on each field, shape (n_fields,).
+    - profit_per_acre: Profit per acre, shape (n_crops,) or (n_fields, n_crops).
+    - cost_per_acre: Working capital needed per acre, same shapes as profit_per_acre.
+    - working_capital: Total working capital available ($). None means unlimited.
+    - min_acres / max_acres: Optional per-crop acreage bounds, shape (n_crops,);
+      use np.inf for no upper bound.
+    - max_share: Optional per-crop maximum share of planted acres (rotation limit).
+    - allowed: Optional boolean mask (n_fields, n_crops); False excludes a crop
+      from a field, e.g. corn following corn.
+    - field_ids: Optional labels for the fields.
+    """
+
+    def __init__(self, crops, field_acres, profit_per_acre, cost_per_acre,
+                 working_capital=None, min_acres=None, max_acres=None,
+                 max_share=None, allowed=None, field_ids=None):
+        self.crops = list(crops)
+        self.field_acres = np.atleast_1d(np.asarray(field_acres, dtype=float)).copy()
+        n_fields, n_crops = len(self.field_acres), len(self.crops)
+        self.field_ids = list(field_ids) if field_ids is not None else list(range(n_fields))
+        self.profit = np.broadcast_to(np.asarray(profit_per_acre, dtype=float), (n_fields, n_crops)).copy()
+        self.cost = np.broadcast_to(np.asarray(cost_per_acre, dtype=float), (n_fields, n_crops)).copy()
+        if allowed is None:
+            allowed = np.ones((n_fields, n_crops), dtype=bool)
+        self.allowed = np.broadcast_to(np.asarray(allowed, dtype=bool), (n_fields, n_crops)).copy()
+
+        self.working_capital = working_capital
+        self.min_acres = self._crop_vector(min_acres, 0.0)
+        self.max_acres = self._crop_vector(max_acres, np.inf)
+        self.max_share = self._crop_vector(max_share, 1.0)
+
+        self._build()
+
+    def _crop_vector(self, values, default):
+        if values is None:
+            return np.full(len(self.crops), default, dtype=float)
+        return np.broadcast_to(np.asarray(values, dtype=float), (len(self.crops),)).copy()
+
+    def _build(self):
+        """Create variables and constraints for every allowed (field, crop) pair."""
+        self.problem = pulp.LpProblem("crop_allocation", pulp.LpMaximize)
+        self._field_index, self._crop_index = np.nonzero(self.allowed)
+        self._variables = [
+            pulp.LpVariable(f"x_{i}_{j}", lowBound=0)
+            for i, j in zip(self._field_index, self._crop_index)
+        ]
+        # Positions of each field's / crop's variables, used for the row constraints.
+        order = np.argsort(self._field_index, kind="stable")
+        splits = np.searchsorted(self._field_index[order], np.arange(1, len(self.field_acres)))
+        self._field_members = np.split(order, splits)
+        self._crop_members = [np.flatnonzero(self._crop_index == j) for j in range(len(self.crops))]
+
+        self.problem.setObjective(self._objective_expression())
+        for i, members in enumerate(self._field_members):
+            self._set_constraint(f"land_{i}", members, 1.0, pulp.LpConstraintLE, self.field_acres[i])
+        for j in range(len(self.crops)):
+            self._set_crop_limit_constraints(j)
+            self._set_share_constraint(j)
+        self._set_capital_constraint()
+
+    def _objective_expression(self):
+        coefficients = self.profit[self._field_index, self._crop_index]
+        return pulp.LpAffineExpression(zip(self._variables, coefficients.tolist()))
+
+    def _set_constraint(self, name, members, coefficients, sense, rhs):
+        coefficients = np.broadcast_to(np.asarray(coefficients, dtype=float), (len(members),))
+        expression = pulp.LpAffineExpression(
+            (self._variables[k], c) for k, c in zip(members, coefficients.tolist())
+        )
+        self.problem.constraints[name] = pulp.LpConstraint(expression, sense=sense, name=name, rhs=float(rhs))
+
+    def _set_crop_limit_constraints(self, j):
+        members = self._crop_members[j]
+        self._set_constraint(f"min_{j}", members, 1.0, pulp.LpConstraintGE, self.min_acres[j])
+        if np.isfinite(self.max_acres[j]):
+            self._set_constraint(f"max_{j}", members, 1.0, pulp.LpConstraintLE, self.max_acres[j])
+        else:
+            self.problem.constraints.pop(f"max_{j}", None)
+
+    def _set_share_constraint(self, j):
+        # acres_j - share_j * planted acres <= 0
+        coefficients = np.full(len(self._variables), -self.max_share[j])
+        coefficients[self._crop_members[j]] += 1.0
+        self._set_constraint(f"share_{j}", np.arange(len(self._variables)), coefficients,
+                             pulp.LpConstraintLE, 0.0)
+
+    def _set_capital_constraint(self):
+        if self.working_capital is None:
+            self.problem.constraints.pop("capital", None)
+            return
+        coefficients = self.cost[self._field_index, self._crop_index]
+        self._set_constraint("capital", np.arange(len(self._variables)), coefficients,
+                             pulp.LpConstraintLE, self.working_capital)
+
+    def _crop_position(self, crop):
+        return self.crops.index(crop)
+
+    def set_field_acres(self, field_acres):
+        """Update available acres; only fields whose acreage changed are touched."""
+        field_acres = np.broadcast_to(np.asarray(field_acres, dtype=float), self.field_acres.shape)
+        for i in np.flatnonzero(field_acres != self.field_acres):
+            self.problem.constraints[f"land_{i}"].changeRHS(float(field_acres[i]))
+        self.field_acres = field_acres.copy()
+
+    def set_profit(self, crop, profit_per_acre):
+        """Update the profit per acre of one crop (scalar or per-field array)."""
+        j = self._crop_position(crop)
+        self.profit[:, j] = profit_per_acre
+        members = self._crop_members[j]
+        for k, value in zip(members, self.profit[self._field_index[members], j].tolist()):
+            self.problem.objective[self._variables[k]] = value
+
+    def set_cost(self, crop, cost_per_acre):
+        """Update the working capital needed per acre of one crop."""
+        j = self._crop_position(crop)
+        self.cost[:, j] = cost_per_acre
+        self._set_capital_constraint()
+
+    def set_working_capital(self, working_capital):
+        """Update the working capital limit. None removes the constraint."""
+        if self.working_capital is not None and working_capital is not None:
+            self.working_capital = working_capital
+            self.problem.constraints["capital"].changeRHS(float(working_capital))
+        else:
+            self.working_capital = working_capital
+            self._set_capital_constraint()
+
+    def set_crop_limits(self, crop, min_acres=None, max_acres=None):
+        """Update the total acreage bounds of one crop."""
+        j = self._crop_position(crop)
+        if min_acres is not None:
+            self.min_acres[j] = min_acres
+            self.problem.constraints[f"min_{j}"].changeRHS(float(min_acres))
+        if max_acres is not None:
+            had_limit = np.isfinite(self.max_acres[j])
+            self.max_acres[j] = max_acres
+            if had_limit and np.isfinite(max_acres):
+                self.problem.constraints[f"max_{j}"].changeRHS(float(max_acres))
+            else:
+                self._set_crop_limit_constraints(j)
+
+    def set_max_share(self, crop, max_share):
+        """Update the rotation limit (maximum share of planted acres) of one crop."""
+        j = self._crop_position(crop)
+        self.max_share[j] = max_share
+        self._set_share_constraint(j)
+
+    def solve(self, time_limit=None):
+        """Solve the model, warm-starting from the previous solution if there is one.
+
+        Returns:
+        Dict with 'status', 'total_profit', 'acres' (n_fields x n_crops array),
+        'crop_acres' (Series by crop) and 'allocation' (long DataFrame of the
+        non-zero field/crop acres).
+        """
+        warm_start = any(v.varValue is not None for v in self._variables)
+        solver = pulp.PULP_CBC_CMD(msg=False, warmStart=warm_start, timeLimit=time_limit)
+        with instrumentation.span('optimizer.solve'):
+            self.problem.solve(solver)
+        instrumentation.count('optimizer.solves')
+        status = pulp.LpStatus[self.problem.status]
+
+        values = np.array([v.varValue or 0.0 for v in self._variables])
+        acres = np.zeros(self.profit.shape)
+        acres[self._field_index, self._crop_index] = values
+        nonzero = np.nonzero(acres > 1e-9)
+        allocation = pd.DataFrame({
+            'Field': np.asarray(self.field_ids, dtype=object)[nonzero[0]],
+            'Crop': np.asarray(self.crops, dtype=object)[nonzero[1]],
+            'Acres': acres[nonzero],
+        })
+        return {
+            'status': status,
+            'total_profit': float((acres * self.profit).sum()),
+            'acres': acres,
+            'crop_acres': pd.Series(acres.sum(axis=0), index=self.crops, name='Acres'),
+            'allocation': allocation,
+        }
+
+
+def optimize_allocation(crop_df, total_land, working_capital=None, min_acres=None,
+                        max_acres=None, max_share=None):
+    """Allocate a single farm's land across crops.
+
+    Parameters:
+    - crop_df: DataFrame indexed by crop with 'Profit per Acre' and 'Cost per Acre'.
+    - total_land: Total available land (acres).
+    - working_capital, min_acres, max_acres, max_share: See AllocationModel.
+
+    Returns:
+    The AllocationModel.solve() result dict.
+    """
+    model = AllocationModel(
+        crop_df.index.tolist(),
+        [total_land],
+        crop_df['Profit per Acre'].to_numpy(),
+        crop_df['Cost per Acre'].to_numpy(),
+        working_capital=working_capital,
+        min_acres=min_acres,
+        max_acres=max_acres,
+        max_share=max_share,
+    )
+    return model.solve()
@@ -0,0 +1,47 @@
+import importlib
+
+# Registry of lazily imported report backends: name -> 'module:attribute'. Each
+# backend module imports its heavy dependency (WeasyPrint, reportlab) at the
+# top, so nothing is imported until the backend is first used and the
+# dependencies stay out of the app's cold start.
+# Backends take (context, target), see utils.generate_pdf_report.
+REPORT_BACKENDS = {
+    'weasyprint': 'report_weasyprint:render',
+    'reportlab': 'report_reportlab:render',
+}
+
+_loaded = {}
+
+
+class PluginError(LookupError):
+    """Raised when a plugin is not registered or cannot be imported."""
+
+
+def register_report_backend(name, target):
+    """Register a report backend as 'module:attribute' or a callable(context, target)."""
+    REPORT_BACKENDS[name] = target
+    _loaded.pop(('report backend', name), None)
+
+
+def _resolve(kind, registry, name):
+    key = (kind, name)
+    if key in _loaded:
+        return _loaded[key]
+    try:
+        target = registry[name]
+    except KeyError:
+        raise PluginError(f"Unknown {kind}: {name} (available: {', '.join(sorted(registry))})") from None
+    if isinstance(target, str):
+        module_name, _, attribute = target.partition(':')
+        try:
+            target = getattr(importlib.import_module(module_name), attribute)
+        except (ImportError, OSError, AttributeError) as e:
+            # OSError: importing WeasyPrint raises it when Pango and its other system libraries are missing.
+            raise PluginError(f"Cannot load {kind} {name!r} from {registry[name]}: {e}") from e
+    _loaded[key] = target
+    return target
+
+
+def report_backend(name):
+    """The report backend registered as name, imported on first use."""
+    return _resolve('report backend', REPORT_BACKENDS, name)
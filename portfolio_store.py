@@ -0,0 +1,317 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from budget_model import CATEGORY_NAMES, BudgetBook, StringTable
+
+# Bump when the on-disk layout changes.
+STORE_VERSION = 2
+
+# Columns of the field table passed to write_store, and the array file and
+# dtype each is stored as. Label columns are stored as int32 codes.
+FIELD_COLUMNS = {
+    'Field': ('field_id', None),
+    'Grower': ('grower', np.int32),
+    'Year': ('year', np.int16),
+    'Crop': ('crop', np.int32),
+    'Region': ('region', np.int32),
+    'Acres': ('acres', np.float64),
+    'Yield': ('yield', np.float64),
+    'Price': ('price', np.float64),
+    'Other_Revenue': ('other_revenue', np.float64),
+}
+LABEL_COLUMNS = ('Grower', 'Crop', 'Region')
+# Columns write_store fills in when the field table does not have them.
+OPTIONAL_COLUMNS = {'Other_Revenue': 0.0}
+
+
+def _open_array(path, dtype, shape):
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+
+
+def write_store(path, fields, costs, cost_items, cost_categories=None, chunk_rows=1_000_000):
+    """Write a field portfolio as memory-mapped column files.
+
+    Rows are sorted by grower (stable, so the input order is kept within a
+    grower), which makes every grower's rows one contiguous slice. A region
+    index (row numbers grouped by region) is stored alongside. The store is
+    built in a temporary directory and moved into place at the end, so
+    readers never see a half-written store.
+
+    Parameters:
+    - path: Store directory (replaced if it exists).
+    - fields: DataFrame with the FIELD_COLUMNS (Field, Grower, Year, Crop,
+      Region, Acres, Yield, Price and optionally Other_Revenue, e.g. straw
+      revenue per acre), one row per field-year. Grower, Crop and Region
+      must not be missing.
+    - costs: Array (n_rows, n_items) of cost per acre of each cost item, or
+      a function returning those rows for an array of row numbers (so the
+      full cost matrix never has to exist in memory).
+    - cost_items: Names of the cost columns.
+    - cost_categories: Optional category of each cost column (see
+      budget_model.CATEGORY_NAMES).
+    - chunk_rows: Rows copied per step, bounding the extra memory used.
+
+    Returns:
+    The opened PortfolioStore.
+    """
+    missing = [name for name in FIELD_COLUMNS if name not in fields.columns and name not in OPTIONAL_COLUMNS]
+    if missing:
+        raise ValueError(f"Field table is missing columns: {', '.join(missing)}")
+    unlabelled = [name for name in LABEL_COLUMNS if fields[name].isna().any()]
+    if unlabelled:
+        raise ValueError(f"Field table has rows without a {', '.join(unlabelled)} label")
+    fields = fields.assign(**{
+        name: fields[name].fillna(default) if name in fields.columns else default
+        for name, default in OPTIONAL_COLUMNS.items()
+    })
+    n_rows = len(fields)
+    if not callable(costs):
+        costs = np.asarray(costs)
+        if costs.shape != (n_rows, len(cost_items)):
+            raise ValueError(f"Cost array must have shape ({n_rows}, {len(cost_items)}), not {costs.shape}")
+    cost_rows = costs if callable(costs) else costs.__getitem__
+
+    labels = {name: pd.Categorical(fields[name]) for name in LABEL_COLUMNS}
+    order = np.argsort(labels['Grower'].codes, kind='stable')
+    columns = {name: labels[name].codes if name in labels else fields[name].to_numpy() for name in FIELD_COLUMNS}
+    field_ids = columns['Field']
+    if field_ids.dtype == object:
+        columns['Field'] = field_ids.astype(str)
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix='.portfolio-')
+    try:
+        with instrumentation.span('portfolio_store.write'):
+            targets = {}
+            for name, (file_name, dtype) in FIELD_COLUMNS.items():
+                dtype = dtype or columns[name].dtype
+                targets[name] = _open_array(os.path.join(staging, f'{file_name}.npy'), dtype, (n_rows,))
+            cost_target = _open_array(os.path.join(staging, 'costs.npy'), np.float64, (n_rows, len(cost_items)))
+            for start in range(0, n_rows, chunk_rows):
+                rows = order[start:start + chunk_rows]
+                for name, target in targets.items():
+                    target[start:start + len(rows)] = columns[name][rows]
+                cost_target[start:start + len(rows)] = cost_rows(rows)
+            for target in list(targets.values()) + [cost_target]:
+                target.flush()
+            del targets, cost_target
+
+            grower_counts = np.bincount(labels['Grower'].codes[order], minlength=len(labels['Grower'].categories))
+            np.save(os.path.join(staging, 'grower_offsets.npy'), np.concatenate([[0], np.cumsum(grower_counts)]))
+            region_codes = labels['Region'].codes[order]
+            region_counts = np.bincount(region_codes, minlength=len(labels['Region'].categories))
+            np.save(os.path.join(staging, 'region_rows.npy'), np.argsort(region_codes, kind='stable').astype(np.int64))
+            np.save(os.path.join(staging, 'region_offsets.npy'), np.concatenate([[0], np.cumsum(region_counts)]))
+
+            meta = {
+                'version': STORE_VERSION,
+                'rows': n_rows,
+                'cost_items': [str(item) for item in cost_items],
+                'cost_categories': None if cost_categories is None else [str(c) for c in cost_categories],
+                'labels': {name: [str(v) for v in labels[name].categories] for name in LABEL_COLUMNS},
+            }
+            with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+        _swap_in(staging, path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return PortfolioStore(path)
+
+
+def _swap_in(staging, path):
+    """Move the finished staging directory to path, replacing any existing store.
+
+    The old store is renamed aside before the new one takes its place and is
+    only deleted afterwards, so it is never lost: a failed swap puts it back,
+    and after a crash it is still on disk next to path.
+    """
+    if not os.path.exists(path):
+        os.replace(staging, path)
+        return
+    retired = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.portfolio-old-')
+    os.rmdir(retired)
+    os.replace(path, retired)
+    try:
+        os.replace(staging, path)
+    except BaseException:
+        os.replace(retired, path)
+        raise
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def write_store_from_budgets(path, fields, budgets, **kwargs):
+    """Write a store whose cost vectors come from loaded crop budgets.
+
+    Parameters:
+    - fields: Field table as for write_store; Yield, Price and
+      Other_Revenue may be missing or NaN, in which case the crop budget's
+      values (Other_Revenue: its straw revenue) are used.
+    - budgets: Dict of crop name -> result of data_loader.load_data.
+    """
+    fields = fields.copy()
+    item_categories = {}
+    for budget in budgets.values():
+        if budget is not None:
+            for item, category in zip(budget['cost_data']['Cost_Item'], budget['cost_data']['Category']):
+                item_categories.setdefault(item, category)
+    cost_items = list(item_categories)
+    crops = list(budgets)
+    vectors = np.zeros((len(crops) + 1, len(cost_items)))
+    defaults = np.full((len(crops) + 1, 3), np.nan)
+    for i, crop in enumerate(crops):
+        budget = budgets[crop]
+        if budget is None:
+            continue
+        item_costs = budget['cost_data'].groupby('Cost_Item', sort=False)['Cost_Value'].sum()
+        vectors[i] = item_costs.reindex(cost_items, fill_value=0.0).to_numpy()
+        straw_revenue = budget.get('straw_revenue', 0.0)
+        defaults[i] = budget['yield_value'], budget['price_value'], 0.0 if pd.isna(straw_revenue) else straw_revenue
+    # Crops without a budget map to the last (all-zero, NaN) row.
+    crop_rows = pd.Categorical(fields['Crop'], categories=crops).codes
+    crop_rows = np.where(crop_rows < 0, len(crops), crop_rows)
+    for position, name in enumerate(['Yield', 'Price', 'Other_Revenue']):
+        given = fields[name].to_numpy(dtype=float) if name in fields else np.full(len(fields), np.nan)
+        fields[name] = np.where(np.isnan(given), defaults[crop_rows, position], given)
+    return write_store(path, fields, lambda rows: vectors[crop_rows[rows]], cost_items,
+                       cost_categories=list(item_categories.values()), **kwargs)
+
+
+class PortfolioStore:
+    """Read-only view of a store written by write_store.
+
+    Every column is a read-only np.memmap, so opening a store costs nothing
+    and the OS pages in only the rows that are touched. Slices by grower are
+    zero-copy views; region, crop and year selections return row numbers.
+
+        store = PortfolioStore('portfolio')
+        rows = store.grower_rows('Smith Farms')           # a slice
+        acres = store['acres'][rows]                       # a view
+        profit = store.profit_per_acre(store.region_rows('Midwest'))
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported portfolio store version: {meta.get('version')}")
+        self.path = path
+        self.n_rows = meta['rows']
+        self.cost_items = meta['cost_items']
+        self.cost_categories = meta.get('cost_categories')
+        self.labels = meta['labels']
+        self._codes = {name: {label: i for i, label in enumerate(values)} for name, values in self.labels.items()}
+        self._arrays = {}
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, name):
+        """Memory-mapped array: a FIELD_COLUMNS file name (e.g. 'acres', 'crop') or 'costs'."""
+        array = self._arrays.get(name)
+        if array is None:
+            array = self._arrays[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return array
+
+    @property
+    def growers(self):
+        return self.labels['Grower']
+
+    @property
+    def regions(self):
+        return self.labels['Region']
+
+    @property
+    def crops(self):
+        return self.labels['Crop']
+
+    def code(self, column, label):
+        """Code of a Grower, Crop or Region label; KeyError when it is not in the store."""
+        try:
+            return self._codes[column][label]
+        except KeyError:
+            raise KeyError(f"{column} not in portfolio: {label}") from None
+
+    def grower_rows(self, grower):
+        """Contiguous slice of one grower's rows."""
+        g = self.code('Grower', grower)
+        offsets = self['grower_offsets']
+        return slice(int(offsets[g]), int(offsets[g + 1]))
+
+    def region_rows(self, region):
+        """Row numbers (ascending) of one region, read from the region index."""
+        r = self.code('Region', region)
+        offsets = self['region_offsets']
+        return self['region_rows'][offsets[r]:offsets[r + 1]]
+
+    def rows(self, grower=None, region=None, crop=None, year=None):
+        """Row selection matching all given filters: a slice when only grower is given."""
+        if grower is not None and region is None and crop is None and year is None:
+            return self.grower_rows(grower)
+        if region is not None:
+            rows = np.asarray(self.region_rows(region))
+        else:
+            rows = np.arange(self.n_rows)
+        if grower is not None:
+            selected = self.grower_rows(grower)
+            rows = rows[(rows >= selected.start) & (rows < selected.stop)]
+        if crop is not None:
+            rows = rows[self['crop'][rows] == self.code('Crop', crop)]
+        if year is not None:
+            rows = rows[self['year'][rows] == year]
+        return rows
+
+    def total_costs(self, rows=slice(None)):
+        return self['costs'][rows].sum(axis=1)
+
+    def profit_per_acre(self, rows=slice(None)):
+        revenue = self['yield'][rows] * self['price'][rows] + self['other_revenue'][rows]
+        return revenue - self.total_costs(rows)
+
+    def frame(self, rows=slice(None)):
+        """Field table of the selected rows as a DataFrame (copies; keep selections small)."""
+        data = {}
+        for name, (file_name, dtype) in FIELD_COLUMNS.items():
+            values = np.asarray(self[file_name][rows])
+            if name in LABEL_COLUMNS:
+                values = pd.Categorical.from_codes(values, categories=self.labels[name])
+            data[name] = values
+        frame = pd.DataFrame(data)
+        frame['Total_Cost'] = self.total_costs(rows)
+        return frame
+
+    def to_budget_book(self, rows=slice(None)):
+        """The selected rows as a budget_model.BudgetBook (one budget per row).
+
+        The book gets its own crop and cost-item tables built from the store's
+        labels, so converting large stores does not grow the shared tables.
+        """
+        costs = np.asarray(self['costs'][rows])
+        n_budgets, n_items = costs.shape
+        crops = StringTable(self.crops)
+        items = StringTable(self.cost_items)
+        if self.cost_categories is None:
+            item_categories = np.full(n_items, -1, dtype=np.int8)
+        else:
+            item_categories = pd.Categorical(self.cost_categories, categories=CATEGORY_NAMES).codes.astype(np.int8)
+        return BudgetBook(
+            crop_codes=self['crop'][rows],
+            region_codes=self['region'][rows],
+            yields=self['yield'][rows],
+            prices=self['price'][rows],
+            other_revenue=self['other_revenue'][rows],
+            offsets=np.arange(n_budgets + 1) * n_items,
+            item_codes=np.tile(items.encode(self.cost_items), n_budgets),
+            category_codes=np.tile(item_categories, n_budgets),
+            cost_values=costs.ravel(),
+            items=items,
+            crops=crops,
+            regions=StringTable(self.regions),
+        )
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# Region adjustment factors applied to the base (Midwest) costs.
+DEFAULT_REGION_FACTORS = {
+    'Midwest': 1.0,
+    'Great Plains': 0.95,
+}
+
+
+def read_region_table(source):
+    """Read a region adjustment table.
+
+    Parameters:
+    - source: Path to a CSV file or a DataFrame with a 'Region' column and a
+      'Factor' column. Any other column named after a cost item or a cost
+      category (e.g. 'Direct Costs') gives a factor for just those items and
+      overrides 'Factor'; empty cells fall back to 'Factor'.
+
+    Returns:
+    DataFrame indexed by Region.
+    """
+    table = pd.read_csv(source) if isinstance(source, str) else source.copy()
+    if 'Region' not in table.columns:
+        raise ValueError("Region table needs a 'Region' column")
+    if 'Factor' not in table.columns:
+        table['Factor'] = 1.0
+    return table.set_index('Region')
+
+
+class RegionalCostModel:
+    """Regional costs as base cost vector times region adjustment factors.
+
+    Costs are never stored per region: factors are either one scalar per region
+    (shape (n_regions,)) or one factor per region and cost item (shape
+    (n_regions, n_items)), and regional costs are produced by broadcasting only
+    for the regions a caller asks for.
+
+    Parameters:
+    - cost_items: Names of the cost items.
+    - base_costs: Base cost of each item, shape (n_items,).
+    - regions: Region names.
+    - factors: Adjustment factors, shape (n_regions,) or (n_regions, n_items).
+    - categories: Optional category of each cost item.
+    """
+
+    def __init__(self, cost_items, base_costs, regions, factors, categories=None):
+        self.cost_items = np.asarray(cost_items, dtype=object)
+        self.base_costs = np.asarray(base_costs, dtype=float)
+        self.regions = pd.Index(regions, name='Region')
+        self.factors = np.asarray(factors, dtype=float)
+        self.categories = None if categories is None else np.asarray(categories, dtype=object)
+        if self.factors.shape[0] != len(self.regions):
+            raise ValueError("Need one row of factors per region")
+
+    @classmethod
+    def from_cost_data(cls, cost_df, regions=None):
+        """Build the model from a loader 'cost_data' frame.
+
+        Parameters:
+        - cost_df: Frame with Cost_Item, Cost_Value and optionally Category.
+        - regions: Dict of region -> factor, a region table (see
+          read_region_table) or None for DEFAULT_REGION_FACTORS.
+        """
+        items = cost_df['Cost_Item'].to_numpy(dtype=object)
+        base_costs = cost_df['Cost_Value'].to_numpy(dtype=float)
+        categories = cost_df['Category'].to_numpy(dtype=object) if 'Category' in cost_df else None
+        if regions is None:
+            regions = DEFAULT_REGION_FACTORS
+        if isinstance(regions, dict):
+            return cls(items, base_costs, list(regions), list(regions.values()), categories)
+
+        table = read_region_table(regions)
+        factors = table['Factor'].to_numpy(dtype=float)
+        overrides = [c for c in table.columns if c != 'Factor']
+        if overrides:
+            # Expand to one factor per item only when the table has item/category columns.
+            matrix = np.repeat(factors[:, None], len(items), axis=1)
+            for column in overrides:
+                if categories is not None and column in set(categories):
+                    targets = categories == column
+                else:
+                    targets = items == column
+                if not targets.any():
+                    continue
+                values = table[column].to_numpy(dtype=float)
+                matrix[:, targets] = np.where(np.isnan(values), factors, values)[:, None]
+            factors = matrix
+        return cls(items, base_costs, table.index, factors, categories)
+
+    def _region_positions(self, regions):
+        if regions is None:
+            return slice(None)
+        if isinstance(regions, str):
+            regions = [regions]
+        positions = self.regions.get_indexer(regions)
+        if (positions < 0).any():
+            missing = [r for r, p in zip(regions, positions) if p < 0]
+            raise KeyError(f"Unknown region(s): {missing}")
+        return positions
+
+    def costs(self, regions=None):
+        """Cost matrix (n_selected_regions, n_items) for the given regions (all by default)."""
+        factors = self.factors[self._region_positions(regions)]
+        if factors.ndim == 1:
+            factors = factors[:, None]
+        return factors * self.base_costs[None, :]
+
+    def region_costs(self, region):
+        """Costs of a single region as a Series indexed by cost item."""
+        return pd.Series(self.costs([region])[0], index=self.cost_items, name=region)
+
+    def totals(self, regions=None):
+        """Total cost per region without materializing the cost matrix."""
+        factors = self.factors[self._region_positions(regions)]
+        if factors.ndim == 1:
+            values = factors * self.base_costs.sum()
+        else:
+            values = factors @ self.base_costs
+        index = self.regions if regions is None else self.regions[self._region_positions(regions)]
+        return pd.Series(values, index=index, name='Cost_Value')
+
+    def to_frame(self, regions=None):
+        """Long-format Region / Cost_Item / Cost_Value frame, as the loaders return."""
+        positions = self._region_positions(regions)
+        selected = self.regions[positions]
+        n_items = len(self.cost_items)
+        return pd.DataFrame({
+            'Region': np.repeat(selected.to_numpy(dtype=object), n_items),
+            'Cost_Item': np.tile(self.cost_items, len(selected)),
+            'Cost_Value': self.costs(regions).ravel(),
+        })
@@ -0,0 +1,59 @@
+"""reportlab report backend: a plain tabular PDF drawn directly (no HTML layout).
+
+Registered in plugins.REPORT_BACKENDS; reportlab is imported with this module.
+"""
+import functools
+import io
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from utils import _report_assets
+
+
+@functools.lru_cache(maxsize=None)
+def _logo():
+    """Logo downscaled once to print size, so each PDF embeds a small image."""
+    from PIL import Image
+    logo = Image.open(io.BytesIO(_report_assets()['logo.png']))
+    logo.thumbnail((480, 160))
+    return ImageReader(logo)
+
+
+def render(context, target):
+    """Write the PDF of one report context (see utils.report_context) to target."""
+    width, height = letter
+    pdf = canvas.Canvas(target, pagesize=letter)
+    y = height - 60
+    if context.get('logo_url'):
+        pdf.drawImage(_logo(), 50, y - 10, width=120, height=40, preserveAspectRatio=True, mask='auto')
+        y -= 60
+    pdf.setFont('Helvetica-Bold', 16)
+    pdf.drawString(50, y, "Farm Finance Report")
+    y -= 24
+    pdf.setFont('Helvetica', 11)
+    lines = [f"Crop: {context['crop_name']}", f"Yield: {context['yield_value']}", f"Price: {context['price_value']}"]
+    if context.get('grower'):
+        lines.insert(0, f"Grower: {context['grower']}")
+    for line in lines:
+        pdf.drawString(50, y, line)
+        y -= 16
+    for title, rows in (("Direct Costs", context['direct_costs']), ("Overhead Costs", context['overhead_costs'])):
+        y -= 10
+        pdf.setFont('Helvetica-Bold', 13)
+        pdf.drawString(50, y, title)
+        y -= 18
+        pdf.setFont('Helvetica', 10)
+        for row in rows:
+            if y < 60:
+                pdf.showPage()
+                pdf.setFont('Helvetica', 10)
+                y = height - 60
+            pdf.drawString(60, y, str(row['Cost_Item']))
+            pdf.drawRightString(width - 60, y, f"${row['Cost_Value']:,.2f}")
+            y -= 14
+    y -= 10
+    pdf.setFont('Helvetica-Bold', 12)
+    pdf.drawString(50, y, f"Net Return: ${context['net_return']}")
+    pdf.save()
@@ -0,0 +1,32 @@
+"""WeasyPrint report backend: templates/report_template.html laid out as a PDF.
+
+Registered in plugins.REPORT_BACKENDS; WeasyPrint is imported with this module,
+so only processes that render with this engine pay for it.
+"""
+import functools
+
+from weasyprint import CSS, HTML
+from weasyprint.text.fonts import FontConfiguration
+
+import instrumentation
+from utils import APP_DIR, _report_assets, _report_template
+
+
+@functools.lru_cache(maxsize=None)
+def resources():
+    """Font configuration, compiled stylesheet and image cache shared by every PDF in a process."""
+    font_config = FontConfiguration()
+    stylesheets = []
+    css = _report_assets().get('style.css')
+    if css is not None:
+        stylesheets.append(CSS(string=css.decode('utf-8'), font_config=font_config))
+    return font_config, stylesheets, {}
+
+
+def render(context, target):
+    """Write the PDF of one report context (see utils.report_context) to target."""
+    font_config, stylesheets, image_cache = resources()
+    with instrumentation.span('report.pdf.template'):
+        html = HTML(string=_report_template().render(**context), base_url=APP_DIR)
+    with instrumentation.span('report.pdf.layout'):
+        html.write_pdf(target, stylesheets=stylesheets, font_config=font_config, cache=image_cache)
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+
+def budget_arrays(budgets):
+    """Per-crop yield, price, total cost and other revenue from loaded budgets.
+
+    Parameters:
+    - budgets: Dict of crop name -> result of data_loader.load_data.
+
+    Returns:
+    Tuple (crops, yields, prices, costs, other_revenue) with one entry per crop.
+    """
+    crops = [crop for crop, budget in budgets.items() if budget is not None]
+    yields = np.array([budgets[c]['yield_value'] for c in crops], dtype=float)
+    prices = np.array([budgets[c]['price_value'] for c in crops], dtype=float)
+    costs = np.array([budgets[c]['cost_data']['Cost_Value'].sum() for c in crops], dtype=float)
+    other_revenue = np.nan_to_num(np.array([budgets[c].get('straw_revenue', 0.0) for c in crops], dtype=float))
+    return crops, yields, prices, costs, other_revenue
+
+
+def _adjustment_matrix(adjustments, crops, default):
+    """Previous crop x current crop matrix from a DataFrame, filling gaps with default."""
+    if adjustments is None:
+        return np.full((len(crops), len(crops)), default, dtype=float)
+    matrix = adjustments.reindex(index=crops, columns=crops).to_numpy(dtype=float)
+    return np.where(np.isnan(matrix), default, matrix)
+
+
+def transition_profits(crops, yields, prices, costs, other_revenue=0.0,
+                       yield_adjustments=None, cost_adjustments=None):
+    """Profit per acre of planting each crop after each previous crop.
+
+    Parameters:
+    - crops: Crop names (n_crops).
+    - yields / costs: Base yield and total cost per acre, shape (n_crops,) or
+      (n_fields, n_crops) for field-specific budgets.
+    - prices / other_revenue: Price and non-grain revenue per crop, (n_crops,).
+    - yield_adjustments: DataFrame of yield multipliers indexed by previous
+      crop with a column per current crop, e.g. 0.9 for corn following corn.
+    - cost_adjustments: DataFrame of cost changes per acre ($), same layout.
+
+    Returns:
+    Array (n_fields, n_crops + 1, n_crops). The last previous-crop row is
+    "unknown previous crop" and uses the unadjusted budgets.
+    """
+    n_crops = len(crops)
+    yields = np.atleast_2d(np.asarray(yields, dtype=float))
+    costs = np.atleast_2d(np.asarray(costs, dtype=float))
+    prices = np.broadcast_to(np.asarray(prices, dtype=float), (n_crops,))
+    other_revenue = np.broadcast_to(np.asarray(other_revenue, dtype=float), (n_crops,))
+
+    yield_factor = np.vstack([_adjustment_matrix(yield_adjustments, crops, 1.0), np.ones(n_crops)])
+    cost_delta = np.vstack([_adjustment_matrix(cost_adjustments, crops, 0.0), np.zeros(n_crops)])
+    revenue = yields[:, None, :] * yield_factor[None, :, :] * prices + other_revenue
+    return revenue - (costs[:, None, :] + cost_delta[None, :, :])
+
+
+def plan_rotation(crops, profits, years, previous_crop=None, discount_rate=0.0, field_ids=None):
+    """Profit-maximizing crop sequence per field over a horizon of years.
+
+    Dynamic programming over (year, previous crop): value[t, f, p] is the best
+    discounted profit from year t onward for field f when crop p was planted
+    the year before. Each table entry is computed once from the next year's
+    table, so the cost is O(years * n_fields * n_crops^2) instead of
+    enumerating n_crops^years sequences, and every field is solved in the
+    same array operations.
+
+    Parameters:
+    - crops: Crop names.
+    - profits: Output of transition_profits, (n_fields, n_crops + 1, n_crops).
+    - years: Planning horizon N.
+    - previous_crop: Crop planted last year on each field (names or None per
+      field, or a single value for all fields); None means unknown.
+    - discount_rate: Annual discount rate applied to later years.
+    - field_ids: Optional labels for the fields.
+
+    Returns:
+    Dict with 'sequences' (n_fields, years) crop codes, 'total_profit'
+    (n_fields,) discounted profit per acre, and 'plan' (DataFrame with one row
+    per field, a column per year and Total_Profit).
+    """
+    n_fields, n_states, n_crops = profits.shape
+    unknown = n_states - 1
+    discount = 1.0 / (1.0 + discount_rate)
+
+    # Backward pass: best value of the remaining years for every previous-crop state.
+    policy = np.empty((years, n_fields, n_states), dtype=np.int16)
+    value = np.zeros((n_fields, n_states))
+    for t in range(years - 1, -1, -1):
+        # Planting crop c now leads to state c next year.
+        candidates = profits + discount * value[:, None, :n_crops]
+        policy[t] = candidates.argmax(axis=2)
+        value = candidates.max(axis=2)
+
+    if previous_crop is None:
+        state = np.full(n_fields, unknown)
+    else:
+        names = np.broadcast_to(np.asarray(previous_crop, dtype=object), (n_fields,))
+        lookup = {crop: j for j, crop in enumerate(crops)}
+        state = np.array([lookup.get(name, unknown) for name in names])
+    fields = np.arange(n_fields)
+    total_profit = value[fields, state]
+
+    # Forward pass: follow the policy from each field's starting state.
+    sequences = np.empty((n_fields, years), dtype=np.int16)
+    for t in range(years):
+        sequences[:, t] = policy[t][fields, state]
+        state = sequences[:, t]
+
+    crop_names = np.asarray(crops, dtype=object)
+    plan = pd.DataFrame(crop_names[sequences], columns=[f'Year_{t + 1}' for t in range(years)])
+    plan.insert(0, 'Field', field_ids if field_ids is not None else fields)
+    plan['Total_Profit'] = total_profit
+    return {
+        'sequences': sequences,
+        'total_profit': total_profit,
+        'plan': plan,
+    }
@@ -0,0 +1,189 @@
+import numpy as np
+
+from simulation import build_scenarios
+
+# Axes are relative to each budget's base price and yield, so crops with very
+# different prices share one grid shape.
+DEFAULT_FACTORS = (0.5, 1.5)
+
+
+def _axis(factors, n):
+    if np.ndim(factors) == 1 and len(factors) != 2:
+        return np.asarray(factors, dtype=float)
+    low, high = factors
+    return np.linspace(low, high, n)
+
+
+def profit_grid(yields, prices, total_costs, yield_axis, price_axis, other_revenue=0.0,
+                cost_multipliers=(1.0,), dtype=np.float32, memory_budget_mb=256):
+    """Profit per acre over price x yield (x cost multiplier) grids for many scenarios.
+
+    Each scenario s has its own absolute axes yields[s] * yield_axis and
+    prices[s] * price_axis. The surface is one broadcasted expression,
+    evaluated in chunks of scenarios x multipliers that fit memory_budget_mb
+    and written into a preallocated result.
+
+    Parameters:
+    - yields / prices / total_costs / other_revenue: Base values per scenario, (n_scenarios,).
+    - yield_axis / price_axis: Relative grid points (e.g. 0.5 .. 1.5).
+    - cost_multipliers: Factors applied to total cost.
+    - dtype: Result dtype; float32 halves the memory of large grids.
+    - memory_budget_mb: Memory allowed for one chunk of intermediate values.
+
+    Returns:
+    Array (n_scenarios, n_multipliers, n_yields, n_prices).
+    """
+    yields = np.atleast_1d(np.asarray(yields, dtype=float))
+    n_scenarios = len(yields)
+    prices = np.broadcast_to(np.asarray(prices, dtype=float), (n_scenarios,))
+    total_costs = np.broadcast_to(np.asarray(total_costs, dtype=float), (n_scenarios,))
+    other_revenue = np.broadcast_to(np.asarray(other_revenue, dtype=float), (n_scenarios,))
+    yield_axis = np.asarray(yield_axis, dtype=float)
+    price_axis = np.asarray(price_axis, dtype=float)
+    multipliers = np.asarray(cost_multipliers, dtype=float)
+
+    n_multipliers, n_yields, n_prices = len(multipliers), len(yield_axis), len(price_axis)
+    profit = np.empty((n_scenarios, n_multipliers, n_yields, n_prices), dtype=dtype)
+    # Revenue does not depend on the cost multiplier: one yield x price plane
+    # per scenario, shifted by each multiplier's cost.
+    plane_bytes = n_yields * n_prices * 8
+    chunk = max(1, int(memory_budget_mb * 1024 * 1024 // plane_bytes))
+    relative_revenue = np.multiply.outer(yield_axis, price_axis)
+    for start in range(0, n_scenarios, chunk):
+        stop = min(start + chunk, n_scenarios)
+        base_revenue = (yields[start:stop] * prices[start:stop])[:, None, None]
+        revenue = relative_revenue * base_revenue + other_revenue[start:stop, None, None]
+        costs = total_costs[start:stop, None] * multipliers
+        for m in range(n_multipliers):
+            np.subtract(revenue, costs[:, m, None, None], out=profit[start:stop, m], casting='same_kind')
+    return profit
+
+
+def break_even(yields, prices, total_costs, yield_axis, price_axis, other_revenue=0.0, cost_multipliers=(1.0,)):
+    """Break-even curves and per-bushel cost over the grid axes.
+
+    Returns:
+    Dict of arrays: 'price' (n_scenarios, n_multipliers, n_yields), the price
+    at which each yield breaks even; 'yield' (n_scenarios, n_multipliers,
+    n_prices), the yield at which each price breaks even; and 'cost_per_unit'
+    (n_scenarios, n_multipliers, n_yields), total cost per bushel.
+    """
+    yields = np.atleast_1d(np.asarray(yields, dtype=float))
+    n_scenarios = len(yields)
+    prices = np.broadcast_to(np.asarray(prices, dtype=float), (n_scenarios,))
+    total_costs = np.broadcast_to(np.asarray(total_costs, dtype=float), (n_scenarios,))
+    other_revenue = np.broadcast_to(np.asarray(other_revenue, dtype=float), (n_scenarios,))
+    costs = total_costs[:, None, None] * np.asarray(cost_multipliers, dtype=float)[None, :, None]
+    needed = costs - other_revenue[:, None, None]
+    yield_values = yields[:, None, None] * np.asarray(yield_axis, dtype=float)
+    price_values = prices[:, None, None] * np.asarray(price_axis, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'price': np.where(yield_values > 0, needed / yield_values, np.nan),
+            'yield': np.where(price_values > 0, needed / price_values, np.nan),
+            'cost_per_unit': np.where(yield_values > 0, costs / yield_values, np.nan),
+        }
+
+
+def scenario_grid(budgets, price_factors=DEFAULT_FACTORS, yield_factors=DEFAULT_FACTORS,
+                  n_prices=1000, n_yields=1000, cost_multipliers=(1.0,), regions=None,
+                  dtype=np.float32, memory_budget_mb=256):
+    """Price x yield (x cost multiplier) profit surfaces for every crop and region.
+
+    Generalizes the "Net return per bushel" and "Total cost per bushel" rows
+    of the budget sheets to the whole grid.
+
+    Parameters:
+    - budgets: Dict of crop name -> result of data_loader.load_data.
+    - price_factors / yield_factors: (low, high) range relative to each
+      budget's price and yield, or explicit relative grid points.
+    - n_prices / n_yields: Grid resolution when a (low, high) range is given.
+    - cost_multipliers: Factors applied to each scenario's total cost.
+    - regions: Region factors or table (see simulation.build_scenarios).
+    - dtype / memory_budget_mb: See profit_grid.
+
+    Returns:
+    Dict with 'scenarios' (DataFrame, one row per Crop/Region), 'yields' and
+    'prices' (absolute axes, (n_scenarios, n_points)), 'cost_multipliers',
+    'profit' and 'net_return_per_unit' ((n_scenarios, n_multipliers,
+    n_yields, n_prices)), 'cost_per_unit' and 'break_even_price'
+    ((n_scenarios, n_multipliers, n_yields)) and 'break_even_yield'
+    ((n_scenarios, n_multipliers, n_prices)).
+    """
+    scenarios = build_scenarios(budgets, regions=regions)
+    yield_axis = _axis(yield_factors, n_yields)
+    price_axis = _axis(price_factors, n_prices)
+    base = {
+        'yields': scenarios['Yield_Mean'].to_numpy(),
+        'prices': scenarios['Price_Mean'].to_numpy(),
+        'total_costs': scenarios['Cost_Mean'].to_numpy(),
+        'other_revenue': scenarios['Other_Revenue'].to_numpy(),
+    }
+    profit = profit_grid(yield_axis=yield_axis, price_axis=price_axis, cost_multipliers=cost_multipliers,
+                         dtype=dtype, memory_budget_mb=memory_budget_mb, **base)
+    curves = break_even(yield_axis=yield_axis, price_axis=price_axis, cost_multipliers=cost_multipliers, **base)
+
+    yields = base['yields'][:, None] * yield_axis
+    with np.errstate(divide='ignore', invalid='ignore'):
+        net_return_per_unit = profit / np.where(yields > 0, yields, np.nan).astype(dtype)[:, None, :, None]
+    return {
+        'scenarios': scenarios[['Crop', 'Region', 'Yield_Mean', 'Price_Mean', 'Cost_Mean', 'Other_Revenue']],
+        'yields': yields,
+        'prices': base['prices'][:, None] * price_axis,
+        'cost_multipliers': np.asarray(cost_multipliers, dtype=float),
+        'profit': profit,
+        'net_return_per_unit': net_return_per_unit,
+        'cost_per_unit': curves['cost_per_unit'],
+        'break_even_price': curves['price'],
+        'break_even_yield': curves['yield'],
+    }
+
+
+def downsample(surface, max_points=200):
+    """Stride a 2-D surface down to at most max_points per axis; returns (surface, row step, column step)."""
+    row_step = max(1, -(-surface.shape[0] // max_points))
+    column_step = max(1, -(-surface.shape[1] // max_points))
+    return surface[::row_step, ::column_step], row_step, column_step
+
+
+def profit_surface_figure(grid, scenario=0, multiplier=0, max_points=200, metric='profit'):
+    """Plotly heatmap of one scenario's surface with its break-even curve.
+
+    The surface is downsampled to max_points per axis before plotting, so a
+    1000 x 1000 grid renders as quickly as a small one.
+    """
+    import plotly.graph_objects as go
+    surface, row_step, column_step = downsample(grid[metric][scenario, multiplier], max_points)
+    yields = grid['yields'][scenario, ::row_step]
+    prices = grid['prices'][scenario, ::column_step]
+    crop, region = grid['scenarios'].iloc[scenario][['Crop', 'Region']]
+    figure = go.Figure(go.Heatmap(
+        x=prices, y=yields, z=surface, colorscale='RdYlGn', zmid=0,
+        colorbar={'title': '$/acre' if metric == 'profit' else '$/bu'},
+    ))
+    break_even_price = grid['break_even_price'][scenario, multiplier, ::row_step]
+    visible = (break_even_price >= prices[0]) & (break_even_price <= prices[-1])
+    figure.add_trace(go.Scatter(
+        x=break_even_price[visible], y=yields[visible], mode='lines',
+        line={'color': 'black', 'width': 2}, name='Break-even',
+    ))
+    figure.update_layout(
+        title=f"{crop} ({region}): {metric.replace('_', ' ')}",
+        xaxis_title='Price ($/bu)', yaxis_title='Yield (bu/acre)',
+    )
+    return figure
+
+
+def break_even_figure(grid, multiplier=0, max_points=200):
+    """Plotly chart of the break-even price against yield for every scenario."""
+    import plotly.graph_objects as go
+    figure = go.Figure()
+    n_yields = grid['yields'].shape[1]
+    step = max(1, -(-n_yields // max_points))
+    for s, (crop, region) in enumerate(grid['scenarios'][['Crop', 'Region']].itertuples(index=False)):
+        figure.add_trace(go.Scatter(
+            x=grid['yields'][s, ::step], y=grid['break_even_price'][s, multiplier, ::step],
+            mode='lines', name=f'{crop} ({region})',
+        ))
+    figure.update_layout(xaxis_title='Yield (bu/acre)', yaxis_title='Break-even price ($/bu)')
+    return figure
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+YIELD_DRIVER = 'Yield'
+PRICE_DRIVER = 'Price'
+
+
+def sensitivity_matrix(costs, yields, prices, shock=0.10, other_revenue=0.0):
+    """Profit impact of +/- shock on every driver, for many fields at once.
+
+    Drivers are the cost items followed by yield and price. Profit is linear in
+    every driver on its own, so each one-at-a-time shock is a single column
+    operation; only yield x price interact.
+
+    Parameters:
+    - costs: Cost per acre of each item, shape (n_items,) or (n_fields, n_items).
+    - yields / prices: Yield and price, scalar or shape (n_fields,).
+    - shock: Relative shock, e.g. 0.10 for +/-10%.
+    - other_revenue: Revenue per acre not tied to yield x price (e.g. straw).
+
+    Returns:
+    Dict of arrays with shape (n_fields, n_items + 2) unless noted:
+    'base_profit' (n_fields,), 'up' and 'down' (profit change for a +shock and
+    a -shock), and 'break_even' (driver value at which profit is zero with the
+    other drivers held at base; NaN when no such value exists).
+    """
+    costs = np.atleast_2d(np.asarray(costs, dtype=float))
+    n_fields = costs.shape[0]
+    yields = np.broadcast_to(np.asarray(yields, dtype=float), (n_fields,))
+    prices = np.broadcast_to(np.asarray(prices, dtype=float), (n_fields,))
+    other_revenue = np.broadcast_to(np.asarray(other_revenue, dtype=float), (n_fields,))
+
+    revenue = yields * prices
+    total_costs = costs.sum(axis=1)
+    base_profit = revenue + other_revenue - total_costs
+
+    # Cost items lower profit by their own change; yield and price scale revenue.
+    unit_impact = np.concatenate([-costs, revenue[:, None], revenue[:, None]], axis=1)
+    up = unit_impact * shock
+    down = -unit_impact * shock
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        needed_revenue = total_costs - other_revenue
+        break_even = np.concatenate([
+            costs + base_profit[:, None],
+            (needed_revenue / prices)[:, None],
+            (needed_revenue / yields)[:, None],
+        ], axis=1)
+    break_even[:, :-2][break_even[:, :-2] < 0] = np.nan
+    break_even[~np.isfinite(break_even)] = np.nan
+    return {
+        'base_profit': base_profit,
+        'up': up,
+        'down': down,
+        'break_even': break_even,
+    }
+
+
+# Shock directions for the two drivers of a pair, in the order pair_impacts stacks them.
+SIGN_COMBINATIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def pair_impacts(up, down, revenue, shock):
+    """Profit change when two drivers are shocked together, for every sign combination.
+
+    Parameters:
+    - up / down: One-at-a-time +shock and -shock impacts for one field, shape
+      (n_drivers,), with yield and price as the last two drivers.
+    - revenue: Yield x price revenue of the field.
+    - shock: Relative shock.
+
+    Returns:
+    Array (4, n_drivers, n_drivers), one matrix per entry of SIGN_COMBINATIONS
+    (direction of the row driver, direction of the column driver); the
+    diagonals are zero.
+    """
+    singles = {1: up, -1: down}
+    pairs = np.empty((len(SIGN_COMBINATIONS), len(up), len(up)))
+    for k, (first, second) in enumerate(SIGN_COMBINATIONS):
+        pairs[k] = singles[first][:, None] + singles[second][None, :]
+        # Yield and price multiply: (1 + a*s)(1 + b*s) - 1 = a*s + b*s + a*b*s^2.
+        pairs[k, -2, -1] += first * second * revenue * shock * shock
+        pairs[k, -1, -2] += first * second * revenue * shock * shock
+        np.fill_diagonal(pairs[k], 0.0)
+    return pairs
+
+
+def sensitivity_analysis(cost_data, yield_value, price_value, shock=0.10, other_revenue=0.0, top_pairs=20):
+    """Tornado data and break-even values for one budget.
+
+    Parameters:
+    - cost_data: The 'cost_data' frame from data_loader.load_data.
+    - yield_value / price_value: Yield and price of the budget.
+    - shock: Relative shock applied to every driver, e.g. 0.10 for +/-10%.
+    - other_revenue: Revenue per acre not tied to yield x price (e.g. straw).
+    - top_pairs: Number of driver pairs to return, ranked by their largest
+      joint impact over the four sign combinations.
+
+    Returns:
+    Dict with 'base_profit', 'tornado' (one row per driver ranked by swing,
+    with Base_Value, Low_Profit, High_Profit, Swing, Break_Even and
+    Break_Even_Change) and 'pairs' (one row per driver pair with the best and
+    worst joint impact, the signs that produce them, and the Interaction beyond
+    the sum of the two single shocks). Drivers with no impact are left out of
+    the pairs, since pairing them only repeats the other driver's impact.
+    """
+    costs = cost_data['Cost_Value'].to_numpy(dtype=float)
+    drivers = np.concatenate([cost_data['Cost_Item'].to_numpy(dtype=object), [YIELD_DRIVER, PRICE_DRIVER]])
+    base_values = np.concatenate([costs, [yield_value, price_value]])
+    result = sensitivity_matrix(costs, yield_value, price_value, shock, other_revenue)
+    base_profit = float(result['base_profit'][0])
+    up, down, break_even = result['up'][0], result['down'][0], result['break_even'][0]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        break_even_change = (break_even - base_values) / base_values
+    tornado = pd.DataFrame({
+        'Driver': drivers,
+        'Base_Value': base_values,
+        'Low_Profit': base_profit + np.minimum(up, down),
+        'High_Profit': base_profit + np.maximum(up, down),
+        'Swing': np.abs(up - down),
+        'Break_Even': break_even,
+        'Break_Even_Change': break_even_change,
+    }).sort_values('Swing', ascending=False, kind='stable').reset_index(drop=True)
+
+    # Pair impacts are sums of single impacts (plus the yield x price term), so
+    # the largest pairs only involve the most extreme singles; score those only.
+    n_drivers = len(drivers)
+    magnitude = np.abs(up[:-2])
+    ranked = np.flatnonzero(magnitude)[np.argsort(-magnitude[magnitude > 0], kind='stable')]
+    # Yield and price both move revenue, so they have an impact unless revenue is zero.
+    revenue_drivers = [n_drivers - 2, n_drivers - 1] if up[-1] != 0 else []
+    candidates = np.concatenate([np.sort(ranked[:top_pairs + 1]), revenue_drivers]).astype(int)
+    pairs = pair_impacts(up[candidates], down[candidates], yield_value * price_value, shock)
+    first, second = np.triu_indices(len(candidates), k=1)
+    joint = pairs[:, first, second]
+    best, worst = joint.argmax(axis=0), joint.argmin(axis=0)
+    columns = np.arange(joint.shape[1])
+    best_impact, worst_impact = joint[best, columns], joint[worst, columns]
+    keep = min(top_pairs, len(columns))
+    order = np.argsort(-np.maximum(np.abs(best_impact), np.abs(worst_impact)), kind='stable')[:keep]
+    signs = np.array([f"{'+' if a > 0 else '-'}/{'+' if b > 0 else '-'}" for a, b in SIGN_COMBINATIONS])
+    first, second = candidates[first], candidates[second]
+    pair_df = pd.DataFrame({
+        'Driver_1': drivers[first[order]],
+        'Driver_2': drivers[second[order]],
+        'Best_Signs': signs[best[order]],
+        'Best_Impact': best_impact[order],
+        'Best_Profit': base_profit + best_impact[order],
+        'Worst_Signs': signs[worst[order]],
+        'Worst_Impact': worst_impact[order],
+        'Worst_Profit': base_profit + worst_impact[order],
+        'Interaction': joint[0, order] - up[first[order]] - up[second[order]],
+    })
+    return {
+        'base_profit': base_profit,
+        'tornado': tornado,
+        'pairs': pair_df,
+    }
@@ -0,0 +1,260 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+from budget_parser import parse_budget_frame
+
+SHEETS_API_URL = 'https://sheets.googleapis.com/v4/spreadsheets'
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+
+# Worksheets holding the tables create_fallback_data stands in for.
+TABLE_WORKSHEETS = {
+    'crop_data': 'Crops',
+    'cost_data': 'Costs',
+    'regional_costs': 'Regional Costs',
+}
+
+# The Sheets API limits the URL length, so very long range lists are split.
+MAX_RANGES_PER_REQUEST = 100
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class SheetsError(RuntimeError):
+    """Raised when a Google Sheets request fails."""
+
+
+class RateLimiter:
+    """Async token bucket allowing `rate` requests per second with bursts of `burst`.
+
+    Bound to the event loop of the fetch it is created for.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def values_to_frame(values, header=True):
+    """Turn a list of row lists from the Sheets API into a DataFrame."""
+    width = max((len(row) for row in values), default=0)
+    rows = [list(row) + [None] * (width - len(row)) for row in values]
+    if header and rows:
+        return pd.DataFrame(rows[1:], columns=rows[0])
+    return pd.DataFrame(rows)
+
+
+class SheetsDataSource:
+    """Concurrent, rate-limited reader of Google Sheets ranges.
+
+    All requests go through one shared (authorized) HTTP session. Ranges of the
+    same spreadsheet are fetched with a single values:batchGet call, separate
+    spreadsheets are fetched concurrently on a small thread pool, and results
+    are cached for `ttl` seconds. Pointing base_url at a local server lets the
+    client run against a stand-in for the Sheets API.
+
+    Parameters:
+    - credentials: google-auth credentials; None uses an unauthenticated session.
+    - base_url: Sheets API spreadsheets endpoint.
+    - session: Optional requests-compatible session to reuse.
+    - max_concurrency: Maximum requests in flight.
+    - requests_per_second: Request rate limit.
+    - ttl: Seconds a fetched range stays cached.
+    - timeout: Per-request timeout in seconds.
+    - max_retries: Retries on 429 and 5xx responses.
+    """
+
+    def __init__(self, credentials=None, base_url=SHEETS_API_URL, session=None,
+                 max_concurrency=4, requests_per_second=5.0, ttl=300, timeout=30,
+                 max_retries=2):
+        if session is None:
+            if credentials is not None:
+                from google.auth.transport.requests import AuthorizedSession
+                session = AuthorizedSession(credentials)
+            else:
+                session = requests.Session()
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='sheets')
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_service_account_file(cls, path, **kwargs):
+        from google.oauth2.service_account import Credentials
+        return cls(credentials=Credentials.from_service_account_file(path, scopes=SCOPES), **kwargs)
+
+    @classmethod
+    def from_service_account_info(cls, info, **kwargs):
+        from google.oauth2.service_account import Credentials
+        return cls(credentials=Credentials.from_service_account_info(info, scopes=SCOPES), **kwargs)
+
+    def _cached(self, key):
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            return None
+
+    def _store(self, key, value):
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic() + self.ttl, value)
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _batch_get(self, spreadsheet_id, ranges):
+        """Blocking values:batchGet call. Returns a list of row lists per range."""
+        url = f"{self.base_url}/{spreadsheet_id}/values:batchGet"
+        params = [('ranges', r) for r in ranges] + [('majorDimension', 'ROWS')]
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise SheetsError(f"Request for {spreadsheet_id} failed: {e}") from e
+            else:
+                if response.status_code == 200:
+                    try:
+                        value_ranges = response.json().get('valueRanges', [])
+                    except ValueError as e:
+                        raise SheetsError(f"Invalid response for {spreadsheet_id}: {e}") from e
+                    return [value_range.get('values', []) for value_range in value_ranges]
+                if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    raise SheetsError(
+                        f"Sheets API returned {response.status_code} for {spreadsheet_id}: {response.text[:200]}"
+                    )
+            time.sleep(0.5 * 2 ** attempt)
+
+    async def fetch_async(self, requests_by_sheet):
+        """Fetch many ranges from many spreadsheets concurrently.
+
+        Parameters:
+        - requests_by_sheet: Dict of spreadsheet id -> list of A1 ranges.
+
+        Returns:
+        Dict of spreadsheet id -> {range: list of row lists}, or the
+        exception raised while fetching that spreadsheet, so one failing
+        spreadsheet does not hide the others.
+        """
+        loop = asyncio.get_running_loop()
+        limiter = RateLimiter(self.requests_per_second, burst=self.max_concurrency)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = {spreadsheet_id: {} for spreadsheet_id in requests_by_sheet}
+
+        async def fetch_batch(spreadsheet_id, ranges):
+            async with semaphore:
+                await limiter.acquire()
+                values = await loop.run_in_executor(self._executor, self._batch_get, spreadsheet_id, ranges)
+            for range_name, rows in zip(ranges, values):
+                self._store((spreadsheet_id, range_name), rows)
+                results[spreadsheet_id][range_name] = rows
+
+        batches = []
+        batch_sheets = []
+        for spreadsheet_id, ranges in requests_by_sheet.items():
+            missing = []
+            for range_name in ranges:
+                rows = self._cached((spreadsheet_id, range_name))
+                if rows is None:
+                    missing.append(range_name)
+                else:
+                    results[spreadsheet_id][range_name] = rows
+            for start in range(0, len(missing), MAX_RANGES_PER_REQUEST):
+                batches.append(fetch_batch(spreadsheet_id, missing[start:start + MAX_RANGES_PER_REQUEST]))
+                batch_sheets.append(spreadsheet_id)
+        outcomes = await asyncio.gather(*batches, return_exceptions=True)
+        for spreadsheet_id, outcome in zip(batch_sheets, outcomes):
+            if isinstance(outcome, Exception):
+                results[spreadsheet_id] = outcome
+        return results
+
+    def fetch(self, requests_by_sheet):
+        """Blocking wrapper around fetch_async, usable from a Streamlit script."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.fetch_async(requests_by_sheet))
+        # Already inside an event loop: run in a helper thread with its own loop.
+        with ThreadPoolExecutor(max_workers=1) as runner:
+            return runner.submit(asyncio.run, self.fetch_async(requests_by_sheet)).result()
+
+    def load_tables(self, spreadsheet_id, worksheets=TABLE_WORKSHEETS):
+        """Load crop, cost and regional tables, falling back to create_fallback_data.
+
+        Returns:
+        Dict shaped like utils.create_fallback_data, plus 'source' set to
+        'sheets' or 'fallback'.
+        """
+        try:
+            values = self.fetch({spreadsheet_id: list(worksheets.values())})[spreadsheet_id]
+            if isinstance(values, Exception):
+                raise values
+            tables = {key: values_to_frame(values[worksheet]) for key, worksheet in worksheets.items()}
+            if 'regional_costs' in tables:
+                tables['regional_costs']['Cost_Value'] = pd.to_numeric(
+                    tables['regional_costs']['Cost_Value'], errors='coerce').astype(float)
+            tables['source'] = 'sheets'
+            return tables
+        except (SheetsError, KeyError, ValueError):
+            from utils import create_fallback_data
+            tables = create_fallback_data()
+            tables['source'] = 'fallback'
+            return tables
+
+    def load_budgets(self, budget_sheets):
+        """Load budget worksheets laid out like the CSV/XLSX budget sheets.
+
+        Parameters:
+        - budget_sheets: Dict of crop name -> (spreadsheet id, worksheet name).
+
+        Returns:
+        Dict of crop name -> parsed budget (see budget_parser.parse_budget_frame),
+        or None for crops whose worksheet could not be read or parsed.
+        """
+        requests_by_sheet = {}
+        for spreadsheet_id, worksheet in budget_sheets.values():
+            requests_by_sheet.setdefault(spreadsheet_id, []).append(worksheet)
+        try:
+            values = self.fetch(requests_by_sheet)
+        except (SheetsError, ValueError):
+            return {crop: None for crop in budget_sheets}
+        budgets = {}
+        for crop, (spreadsheet_id, worksheet) in budget_sheets.items():
+            sheet_values = values.get(spreadsheet_id)
+            if isinstance(sheet_values, Exception):
+                budgets[crop] = None
+                continue
+            try:
+                raw = values_to_frame(sheet_values[worksheet], header=False)
+                budgets[crop] = parse_budget_frame(raw, crop_name=crop)
+            except (KeyError, TypeError, ValueError):
+                budgets[crop] = None
+        return budgets
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,167 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from regional import RegionalCostModel
+
+# Correlation between yield, price and cost draws. Yield and price move against
+# each other (a short crop lifts prices), and cost rises a little with yield.
+DEFAULT_CORRELATION = np.array([
+    [1.0, -0.3, 0.2],
+    [-0.3, 1.0, 0.0],
+    [0.2, 0.0, 1.0],
+])
+
+# float64 yield, price, cost, three normals and the profit for one draw.
+BYTES_PER_DRAW = 7 * 8
+
+
+def build_scenarios(budgets, yield_cv=0.15, price_cv=0.20, cost_cv=0.05, regions=None):
+    """Build simulation inputs per crop and region from loaded budgets.
+
+    Parameters:
+    - budgets: Dict of crop name -> result of data_loader.load_data.
+    - yield_cv / price_cv / cost_cv: Coefficient of variation of each input.
+    - regions: Region factors or table (see RegionalCostModel.from_cost_data);
+      None uses the regions already in each budget's regional_costs.
+
+    Returns:
+    DataFrame with one row per (Crop, Region) and the mean and standard deviation
+    of yield, price and total cost, plus any fixed Other_Revenue (e.g. straw).
+    """
+    rows = []
+    for crop, budget in budgets.items():
+        if budget is None:
+            continue
+        crop_row = budget['crop_data'].iloc[0]
+        other_revenue = crop_row.get('Straw_Revenue', 0.0)
+        other_revenue = 0.0 if pd.isna(other_revenue) else float(other_revenue)
+        if regions is None:
+            regional_totals = budget['regional_costs'].groupby('Region', sort=False)['Cost_Value'].sum()
+        else:
+            regional_totals = RegionalCostModel.from_cost_data(budget['cost_data'], regions).totals()
+        for region, total_cost in regional_totals.items():
+            rows.append({
+                'Crop': crop,
+                'Region': region,
+                'Yield_Mean': float(crop_row['Yield']),
+                'Yield_Std': float(crop_row['Yield']) * yield_cv,
+                'Price_Mean': float(crop_row['Price']),
+                'Price_Std': float(crop_row['Price']) * price_cv,
+                'Cost_Mean': float(total_cost),
+                'Cost_Std': float(total_cost) * cost_cv,
+                'Other_Revenue': other_revenue,
+            })
+    return pd.DataFrame(rows)
+
+
+def _draw_profit(params, cholesky, n_draws, rng):
+    """Draw n_draws correlated scenarios and return profit per acre."""
+    yield_mean, yield_std, price_mean, price_std, cost_mean, cost_std, other_revenue = params
+    z = rng.standard_normal((n_draws, 3)) @ cholesky.T
+    yields = np.maximum(yield_mean + yield_std * z[:, 0], 0.0)
+    # Prices are lognormal with the requested mean and standard deviation.
+    sigma = np.sqrt(np.log1p((price_std / price_mean) ** 2)) if price_mean > 0 else 0.0
+    prices = price_mean * np.exp(sigma * z[:, 1] - 0.5 * sigma ** 2)
+    costs = cost_mean + cost_std * z[:, 2]
+    return yields * prices + other_revenue - costs
+
+
+def _simulate_chunk(task):
+    """Simulate one chunk and reduce it to a histogram plus exact moments."""
+    params, cholesky, n_draws, seed, edges = task
+    profit = _draw_profit(params, cholesky, n_draws, np.random.default_rng(seed))
+    bins = np.clip(np.searchsorted(edges, profit, side='right') - 1, 0, len(edges) - 2)
+    return (
+        np.bincount(bins, minlength=len(edges) - 1),
+        float(profit.sum()),
+        float(np.square(profit).sum()),
+        int(np.count_nonzero(profit < 0)),
+        float(profit.min()),
+        float(profit.max()),
+    )
+
+
+def _histogram_quantiles(edges, counts, quantiles):
+    cumulative = np.concatenate([[0], np.cumsum(counts)]) / counts.sum()
+    return np.interp(quantiles, cumulative, edges)
+
+
+def simulate_profit(scenarios, n_draws=1_000_000, correlation=DEFAULT_CORRELATION,
+                    percentiles=(5, 25, 50, 75, 95), var_level=0.95,
+                    memory_budget_mb=64, max_workers=None, bins=4096, seed=None):
+    """Monte Carlo profit-per-acre distribution for every crop and region.
+
+    Draws are generated in chunks sized to memory_budget_mb per worker and
+    reduced to a fixed histogram, so memory does not grow with n_draws.
+    Chunks are spread over a process pool (all cores by default).
+
+    Parameters:
+    - scenarios: DataFrame from build_scenarios (one row per Crop/Region).
+    - n_draws: Number of draws per scenario.
+    - correlation: 3x3 correlation matrix of (yield, price, cost).
+    - percentiles: Profit percentiles to report.
+    - var_level: Confidence level of the value at risk.
+    - memory_budget_mb: Memory allowed for one chunk of draws.
+    - max_workers: Process count; 1 runs in the current process.
+    - bins: Histogram resolution used for the percentiles.
+    - seed: Seed for reproducible results.
+
+    Returns:
+    DataFrame indexed by (Crop, Region) with Mean, Std, Prob_Loss, VaR,
+    the requested percentiles, Min and Max of profit per acre.
+    """
+    cholesky = np.linalg.cholesky(np.asarray(correlation, dtype=float))
+    chunk_size = max(1, int(memory_budget_mb * 1024 * 1024 // BYTES_PER_DRAW))
+    chunk_sizes = [chunk_size] * (n_draws // chunk_size)
+    if n_draws % chunk_size:
+        chunk_sizes.append(n_draws % chunk_size)
+
+    param_columns = ['Yield_Mean', 'Yield_Std', 'Price_Mean', 'Price_Std', 'Cost_Mean', 'Cost_Std', 'Other_Revenue']
+    scenario_params = scenarios.reindex(columns=param_columns, fill_value=0.0).to_numpy(dtype=float)
+    seeds = iter(np.random.SeedSequence(seed).spawn(len(scenario_params) * (len(chunk_sizes) + 1)))
+
+    # A small pilot sample fixes the histogram range for each scenario.
+    all_edges = []
+    for params in scenario_params:
+        pilot = _draw_profit(params, cholesky, min(n_draws, 100_000), np.random.default_rng(next(seeds)))
+        low, high = np.quantile(pilot, [0.0001, 0.9999])
+        pad = max(high - low, 1.0)
+        all_edges.append(np.linspace(low - pad, high + pad, bins + 1))
+
+    tasks = [
+        (params, cholesky, size, next(seeds), edges)
+        for params, edges in zip(scenario_params, all_edges)
+        for size in chunk_sizes
+    ]
+    if max_workers == 1 or len(tasks) == 1:
+        chunk_results = list(map(_simulate_chunk, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            chunk_results = list(executor.map(_simulate_chunk, tasks))
+
+    quantiles = np.array([1 - var_level] + [p / 100.0 for p in percentiles])
+    rows = []
+    for s, edges in enumerate(all_edges):
+        results = chunk_results[s * len(chunk_sizes):(s + 1) * len(chunk_sizes)]
+        counts = np.sum([r[0] for r in results], axis=0)
+        total = sum(r[1] for r in results)
+        total_sq = sum(r[2] for r in results)
+        mean = total / n_draws
+        values = _histogram_quantiles(edges, counts, quantiles)
+        row = {
+            'Mean': mean,
+            'Std': np.sqrt(max(total_sq / n_draws - mean ** 2, 0.0)),
+            'Prob_Loss': sum(r[3] for r in results) / n_draws,
+            'VaR': -values[0],
+            'Min': min(r[4] for r in results),
+            'Max': max(r[5] for r in results),
+        }
+        for p, value in zip(percentiles, values[1:]):
+            row[f'P{p:g}'] = value
+        rows.append(row)
+
+    index = pd.MultiIndex.from_frame(scenarios[['Crop', 'Region']])
+    return pd.DataFrame(rows, index=index)
@@ -1,15 +1,18 @@
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from google.oauth2 import service_account
-import streamlit as st
 import os
 import io
+import base64
 import datetime
-import jinja2
-from reportlab.pdfgen import canvas
-import xlsxwriter
-from weasyprint import HTML
+import functools
+import itertools
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import instrumentation
+import plugins
+from regional import DEFAULT_REGION_FACTORS, RegionalCostModel
 
 def create_fallback_data():
     """Create sample data structure to use when Google Sheets access fails.
@@ -26,19 +29,10 @@ def create_fallback_data():
         'Item': ['Rent', 'Seed', 'Fertilizer', 'Chemical', 'Insurance', 'Drying', 'Fuel', 'Repairs', 'Interest', 'Depreciation', 'Utilities', 'Misc overhead', 'Labor', 'Management']
     })
     # Sample regional cost data
-    regions = ['Midwest', 'Great Plains']
     cost_items = cost_data['Item'].tolist()
-    regional_rows = []
-    for region in regions:
-        for item in cost_items:
-            base_cost = 25.0  # Sample value
-            cost = base_cost if region == 'Midwest' else base_cost * 0.95
-            regional_rows.append({
-                'Region': region,
-                'Cost_Item': item,
-                'Cost_Value': cost
-            })
-    regional_costs = pd.DataFrame(regional_rows)
+    base_costs = [25.0] * len(cost_items)  # Sample value
+    regional_costs = RegionalCostModel(cost_items, base_costs, list(DEFAULT_REGION_FACTORS),
+                                       list(DEFAULT_REGION_FACTORS.values())).to_frame()
     return {
         'crop_data': crop_data,
         'cost_data': cost_data,
@@ -146,16 +140,333 @@ def identify_optimization_areas(total_input_costs, fertilizer_cost, seed_cost, c
     # Add similar for seed and chemical if needed
     return optimization_areas
 
-def generate_pdf_report(data):
-    """Generate a PDF report for farming analysis."""
-    # TODO: Implement PDF generation logic
-    # This function will create a PDF report with farming data analysis
-    # For now, return a placeholder message
-    return "PDF report generation not yet implemented"
-
-def generate_excel_report(data):
-    """Generate an Excel report for farming analysis."""
-    # TODO: Implement Excel generation logic  
-    # This function will create an Excel report with farming data analysis
-    # For now, return a placeholder message
-    return "Excel report generation not yet implemented"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(APP_DIR, 'templates')
+REPORT_TEMPLATE = 'report_template.html'
+LOGO_PATH = os.path.join(APP_DIR, 'Transparent Logo_1754605512600.png')
+STYLE_PATH = os.path.join(APP_DIR, 'style.css')
+
+@functools.lru_cache(maxsize=None)
+def _report_template():
+    """Compile the Jinja report template once per process."""
+    import jinja2
+    environment = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+        autoescape=jinja2.select_autoescape(['html']),
+    )
+    return environment.get_template(REPORT_TEMPLATE)
+
+@functools.lru_cache(maxsize=None)
+def _report_assets():
+    """Read the logo and stylesheet once per process.
+
+    The logo is also pre-encoded as a data: URI so every rendered report
+    references the same string, which WeasyPrint's image cache then decodes
+    only once.
+    """
+    assets = {}
+    for name, path in (('logo.png', LOGO_PATH), ('style.css', STYLE_PATH)):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                assets[name] = f.read()
+    if 'logo.png' in assets:
+        assets['logo_uri'] = 'data:image/png;base64,' + base64.b64encode(assets['logo.png']).decode('ascii')
+    return assets
+
+def report_context(data):
+    """Template variables for one report.
+
+    Parameters:
+    - data: A budget from data_loader.load_data, optionally with 'grower'
+      (and any extra template variables) added.
+    """
+    cost_df = data['cost_data']
+    summary = summarize_budget(data)
+    context = dict(data)
+    context.update({
+        'crop_name': data['crop_name'],
+        'yield_value': data['yield_value'],
+        'price_value': data['price_value'],
+        'direct_costs': cost_df[cost_df['Category'] == 'Direct Costs'].to_dict('records'),
+        'overhead_costs': cost_df[cost_df['Category'] == 'Overhead Costs'].to_dict('records'),
+        'net_return': f"{summary['Net Return']:.2f}",
+        'summary': summary,
+        'logo_url': _report_assets().get('logo_uri'),
+        'generated_on': datetime.date.today().isoformat(),
+    })
+    return context
+
+@instrumentation.timed('report.pdf')
+def generate_pdf_report(data, engine='weasyprint', output_path=None):
+    """Generate a PDF report for farming analysis.
+
+    The template, logo and stylesheet are loaded and compiled once per
+    process and reused for every report.
+
+    Parameters:
+    - data: Budget dict (see report_context).
+    - engine: Report backend registered in plugins.REPORT_BACKENDS:
+      'weasyprint' renders templates/report_template.html; 'reportlab' draws
+      a plain tabular report, much faster. The backend's dependencies are
+      imported on first use; plugins.PluginError is raised when they cannot be.
+    - output_path: File to write. None returns the PDF as bytes.
+
+    Returns:
+    output_path, or the PDF bytes when no path was given.
+    """
+    context = report_context(data)
+    target = output_path if output_path is not None else io.BytesIO()
+    if engine not in plugins.REPORT_BACKENDS:
+        raise ValueError(f"Unknown PDF engine: {engine} (available: {', '.join(sorted(plugins.REPORT_BACKENDS))})")
+    render = plugins.report_backend(engine)
+    render(context, target)
+    return output_path if output_path is not None else target.getvalue()
+
+def _warm_report_worker(engine):
+    """Process pool initializer: compile the template and assets before the first job."""
+    _report_template()
+    _report_assets()
+    try:
+        plugins.report_backend(engine)
+    except (ValueError, plugins.PluginError):
+        # Unknown or unloadable engines are reported per job by _render_report_job.
+        return
+    if engine == 'weasyprint':
+        import report_weasyprint
+        report_weasyprint.resources()
+
+def _report_file_names(names):
+    """A distinct, filesystem-safe PDF file name for each report name.
+
+    Anything other than letters, digits, '.', '-' and '_' becomes '_' and
+    leading dots are stripped, so names like 'g/2' or '..' stay inside the
+    output directory; names that collide (ignoring case) get -2, -3, ...
+    """
+    used = set()
+    file_names = []
+    for name in names:
+        stem = re.sub(r'[^A-Za-z0-9._-]+', '_', str(name)).strip('._') or 'report'
+        candidate, suffix = stem, 1
+        while candidate.lower() in used:
+            suffix += 1
+            candidate = f"{stem}-{suffix}"
+        used.add(candidate.lower())
+        file_names.append(f"{candidate}.pdf")
+    return file_names
+
+def _render_report_job(job):
+    name, file_name, data, engine, output_dir = job
+    start = time.perf_counter()
+    path = os.path.join(output_dir, file_name)
+    try:
+        generate_pdf_report(data, engine=engine, output_path=path)
+        return {'name': name, 'path': path, 'seconds': time.perf_counter() - start, 'error': None}
+    except Exception as e:
+        return {'name': name, 'path': None, 'seconds': time.perf_counter() - start, 'error': f"{type(e).__name__}: {e}"}
+
+def generate_pdf_reports(reports, output_dir, engine='weasyprint', max_workers=None):
+    """Render many PDF reports (e.g. one per grower) in a process pool.
+
+    Each worker compiles the template and assets once at start-up and then
+    renders its share of the reports.
+
+    Parameters:
+    - reports: Iterable of (name, data) pairs; the PDF is written to
+      output_dir/<name>.pdf, with the name made filesystem-safe and distinct
+      (see _report_file_names).
+    - output_dir: Directory for the PDFs (created if missing).
+    - engine: See generate_pdf_report.
+    - max_workers: Process count (default: all cores).
+
+    Returns:
+    List of dicts with 'name', 'path', 'seconds' and 'error' per report.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    reports = list(reports)
+    file_names = _report_file_names(name for name, _ in reports)
+    jobs = [(name, file_name, data, engine, output_dir) for (name, data), file_name in zip(reports, file_names)]
+    if not jobs:
+        return []
+    workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_warm_report_worker, initargs=(engine,)) as executor:
+        return list(executor.map(_render_report_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+# Column order of per-field rows given as tuples to generate_excel_report.
+FIELD_REPORT_COLUMNS = ['Field', 'Grower', 'Crop', 'Region', 'Acres', 'Yield', 'Price', 'Revenue', 'Cost', 'Profit']
+
+def summarize_budget(budget):
+    """Per-acre summary of one loaded budget (see data_loader.load_data).
+
+    Returns:
+    Dict with Crop, Yield, Price, Revenue, Direct Costs, Overhead Costs,
+    Total Costs and Net Return.
+    """
+    cost_df = budget['cost_data']
+    by_category = cost_df.groupby('Category', observed=False)['Cost_Value'].sum()
+    other_revenue = budget.get('straw_revenue')
+    if other_revenue is None or pd.isna(other_revenue):
+        other_revenue = 0.0
+    total_costs = float(cost_df['Cost_Value'].sum())
+    return {
+        'Crop': budget['crop_name'],
+        'Yield': budget['yield_value'],
+        'Price': budget['price_value'],
+        'Revenue': budget['yield_value'] * budget['price_value'] + other_revenue,
+        'Direct Costs': float(by_category.get('Direct Costs', 0.0)),
+        'Overhead Costs': float(by_category.get('Overhead Costs', 0.0)),
+        'Total Costs': total_costs,
+        'Net Return': calculate_profit_per_acre(budget['yield_value'], budget['price_value'], total_costs) + other_revenue,
+    }
+
+def _report_rows(rows, default_columns):
+    """Return (columns, row tuple iterator) for a DataFrame or an iterable of dicts/tuples."""
+    if rows is None:
+        return [], iter(())
+    if isinstance(rows, pd.DataFrame):
+        return list(rows.columns), rows.itertuples(index=False, name=None)
+    iterator = iter(rows)
+    first = next(iterator, None)
+    if first is None:
+        return [], iter(())
+    rows = itertools.chain([first], iterator)
+    if isinstance(first, dict):
+        columns = list(first)
+        return columns, (tuple(row.get(c) for c in columns) for row in rows)
+    return default_columns[:len(first)], (tuple(row) for row in rows)
+
+def _write_table(worksheet, columns, rows, header_format, start_row=0):
+    """Write a header and stream rows in order. Returns the number of data rows."""
+    worksheet.write_row(start_row, 0, columns, header_format)
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        worksheet.write_row(start_row + count, 0, row)
+    return count
+
+@instrumentation.timed('report.excel')
+def generate_excel_report(data, output_path=None):
+    """Generate an Excel report for farming analysis.
+
+    The workbook is written in xlsxwriter's constant_memory mode: every sheet
+    is streamed row by row to a temporary file, so per-field tables of any
+    length (e.g. a generator over 100k+ fields) never sit in memory at once.
+
+    Parameters:
+    - data: Dict with any of
+      - 'budgets': dict of crop -> budget from data_loader.load_data,
+      - 'fields': DataFrame or iterable of dicts/tuples of per-field rows
+        (tuples follow FIELD_REPORT_COLUMNS),
+      - 'scenarios': DataFrame of scenario results (e.g. simulate_profit).
+    - output_path: File to write. None returns the workbook as bytes.
+
+    Returns:
+    output_path, or the workbook bytes when no path was given.
+    """
+    target = output_path
+    if target is None:
+        handle, target = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True, 'nan_inf_to_errors': True})
+    try:
+        header = workbook.add_format({'bold': True, 'bg_color': '#DDEBD8', 'border': 1})
+        money = workbook.add_format({'num_format': '$#,##0.00'})
+        number = workbook.add_format({'num_format': '#,##0.0'})
+
+        # Sheets are created up front for tab order; each one is still filled strictly top to bottom.
+        summary_sheet = workbook.add_worksheet('Summary')
+        budget_sheet = workbook.add_worksheet('Budgets')
+        totals_sheet = workbook.add_worksheet('Crop Totals')
+        field_sheet = workbook.add_worksheet('Fields')
+        scenario_sheet = workbook.add_worksheet('Scenarios') if data.get('scenarios') is not None else None
+
+        budgets = {crop: budget for crop, budget in (data.get('budgets') or {}).items() if budget is not None}
+        summaries = [summarize_budget(budget) for budget in budgets.values()]
+        summary_columns = ['Crop', 'Yield', 'Price', 'Revenue', 'Direct Costs', 'Overhead Costs', 'Total Costs', 'Net Return']
+        summary_sheet.set_column(0, 0, 14)
+        # Yield is in bushels; only Price onward are dollar amounts.
+        summary_sheet.set_column(1, 1, 14, number)
+        summary_sheet.set_column(2, len(summary_columns) - 1, 14, money)
+        n_summary = _write_table(summary_sheet, summary_columns,
+                                 ([s[c] for c in summary_columns] for s in summaries), header)
+        if n_summary:
+            chart = workbook.add_chart({'type': 'column'})
+            chart.add_series({
+                'name': 'Net Return per Acre',
+                'categories': ['Summary', 1, 0, n_summary, 0],
+                'values': ['Summary', 1, len(summary_columns) - 1, n_summary, len(summary_columns) - 1],
+            })
+            chart.set_title({'name': 'Net Return per Acre by Crop'})
+            chart.set_legend({'none': True})
+            summary_sheet.insert_chart(n_summary + 3, 0, chart)
+
+        budget_sheet.set_column(0, 2, 18)
+        budget_sheet.set_column(3, 3, 14, money)
+        _write_table(budget_sheet, ['Crop', 'Category', 'Cost Item', 'Cost per Acre'], (
+            (crop, category, item, value)
+            for crop, budget in budgets.items()
+            for category, item, value in budget['cost_data'][['Category', 'Cost_Item', 'Cost_Value']]
+                .itertuples(index=False, name=None)
+        ), header)
+
+        # Stream the field rows, keeping only running per-crop totals.
+        field_columns, field_rows = _report_rows(data.get('fields'), FIELD_REPORT_COLUMNS)
+        crop_position = field_columns.index('Crop') if 'Crop' in field_columns else None
+        tracked = [c for c in ('Acres', 'Revenue', 'Cost', 'Profit') if c in field_columns]
+        tracked_positions = [field_columns.index(c) for c in tracked]
+        crop_totals = {}
+
+        def tally(rows):
+            for row in rows:
+                if crop_position is not None:
+                    totals = crop_totals.setdefault(row[crop_position], [0, *[0.0] * len(tracked)])
+                    totals[0] += 1
+                    for k, position in enumerate(tracked_positions, start=1):
+                        value = row[position]
+                        if value is not None and value == value:
+                            totals[k] += value
+                yield row
+
+        field_sheet.freeze_panes(1, 0)
+        field_sheet.set_column(0, max(len(field_columns) - 1, 0), 12)
+        _write_table(field_sheet, field_columns, tally(field_rows), header)
+
+        totals_columns = ['Crop', 'Fields', *tracked]
+        n_totals = _write_table(totals_sheet, totals_columns,
+                                ((crop, *values) for crop, values in crop_totals.items()), header)
+        if n_totals and 'Profit' in tracked:
+            profit_column = totals_columns.index('Profit')
+            chart = workbook.add_chart({'type': 'bar'})
+            chart.add_series({
+                'name': 'Total Profit',
+                'categories': ['Crop Totals', 1, 0, n_totals, 0],
+                'values': ['Crop Totals', 1, profit_column, n_totals, profit_column],
+            })
+            chart.set_title({'name': 'Total Profit by Crop'})
+            chart.set_legend({'none': True})
+            totals_sheet.insert_chart(n_totals + 3, 0, chart)
+
+        if scenario_sheet is not None:
+            scenarios = data['scenarios'].reset_index()
+            n_scenarios = _write_table(scenario_sheet, [str(c) for c in scenarios.columns],
+                                       scenarios.itertuples(index=False, name=None), header)
+            if n_scenarios and 'Mean' in scenarios.columns:
+                mean_column = scenarios.columns.get_loc('Mean')
+                chart = workbook.add_chart({'type': 'column'})
+                chart.add_series({
+                    'name': 'Expected Profit per Acre',
+                    'categories': ['Scenarios', 1, 0, n_scenarios, 1 if scenarios.shape[1] > 1 else 0],
+                    'values': ['Scenarios', 1, mean_column, n_scenarios, mean_column],
+                })
+                chart.set_title({'name': 'Expected Profit per Acre'})
+                chart.set_legend({'none': True})
+                scenario_sheet.insert_chart(n_scenarios + 3, 0, chart)
+    finally:
+        workbook.close()
+
+    if output_path is not None:
+        return output_path
+    try:
+        with open(target, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(target)